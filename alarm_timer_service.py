@@ -1,130 +1,152 @@
 # alarm_timer_service.py
+import heapq
+import json
 import os
-import platform
-import subprocess
-from datetime import datetime, timedelta
-import tempfile
 import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sound_effect_service import SoundEffectService
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-trigger_script_path = os.path.join(script_dir, "trigger_alarm_timer.py")
-dynamic_timer_script_path = os.path.join(script_dir, 'dynamic_timer.sh')
-scheduled_task_xml_path = os.path.join(script_dir, "scheduled_task.xml")
-is_windows = platform.system() == "Windows"
+jobs_file_path = os.path.join(script_dir, "alarms_timers.json")
+# jobs that came due while the app wasn't running still go off if they're at most this late
+missed_job_grace_seconds = 5 * 60
 
 class AlarmTimerService:
-    def __init__(self):
-        self.alarm_cron_file = "/etc/cron.d/alarm_cron"
-        self.timer_cron_file = "/etc/cron.d/timer_cron"
-        self.alarm_task_name = "JarvisChatBotAlarmTask"
-        self.timer_task_name = "JarvisChatBotTimerTask"
-        self.python_exe = os.path.join(script_dir, "venv/bin/python3" if not is_windows else "venv/Scripts/python")
-        self.timer_thread = None
-        self.cancel_event = threading.Event()
-        
+    """
+    Schedules alarms and timers inside the app.
+
+    Jobs sit in a heap ordered by fire time and a single thread sleeps until the
+    earliest one is due, then plays its sound through the app's audio mixer. Jobs are
+    saved to alarms_timers.json whenever they change and are reloaded on restart.
+    Alarms repeat every day at the same time until they're deleted; timers go off once.
+    """
+
+    def __init__(self, jobs_file=jobs_file_path):
+        self.jobs_file = jobs_file
+        self.condition = threading.Condition()
+        self.jobs = {}
+        self.heap = []
+        self.is_running = True
+        self.load()
+        self.thread = threading.Thread(target=self._run, name="alarm_timer", daemon=True)
+        self.thread.start()
+
     def add_alarm(self, alarm_time):
-        print(f"Setting alarm for {alarm_time}.")
-        if is_windows:
-            self._add_scheduled_task(alarm_time, self.alarm_task_name, "alarm")
-        else:
-            self._add_cron_job(alarm_time, "alarm")
+        # alarm_time only needs a time of day; the next time it comes round is used
+        now = datetime.now()
+        fire_time = now.replace(hour=alarm_time.hour, minute=alarm_time.minute, second=0, microsecond=0)
+        if fire_time <= now:
+            fire_time += timedelta(days=1)
+        print(f"Setting alarm for {fire_time}.")
+        return self._add_job("alarm", fire_time.timestamp(), repeat_seconds=24 * 3600)
 
     def add_timer(self, duration):
         print(f"Setting timer for {duration} seconds.")
-        timer_time = datetime.now() + timedelta(seconds=duration)
-        if is_windows:
-            self._add_scheduled_task(timer_time, self.timer_task_name, "timer")
-        else:
-            self._add_cron_job(timer_time, "timer")
-
-    def _add_cron_job(self, time_value, job_type):
-        current_crontab = ""
-        cron_file = self.alarm_cron_file if job_type == "alarm" else self.timer_cron_file
-        # Determine the command to run
-        cron_time = f"{time_value.strftime('%M %H')} * * *" 
-        command = f"{self.python_exe} {trigger_script_path} {job_type}"
-        if job_type == "timer":
-            current_time = datetime.now()
-            delay = (time_value - current_time).total_seconds()
-            if delay < 60:
-                self.cleanup()
-                self.timer_thread = threading.Thread(target=self._run_command_after_delay, args=(delay, job_type))
-                self.timer_thread.start()
-                return
-            else:
-            # check if the time_value seconds is 0.
-                if time_value.second != 0:
-                    command = f"{dynamic_timer_script_path} {time_value.second} {job_type}"
-                cron_time = f"{time_value.strftime('%M %H %d %m')} *"
-
-        new_cron_job = f"{cron_time} {command}\n"
-
-        # Read the current cron file
-        if os.path.exists(cron_file):
-            with open(cron_file, 'r') as file:
-                current_crontab = file.read()      
-
-        # Add the new cron job to the cron file
-        updated_crontab = current_crontab + new_cron_job
-
-        # Write the updated cron file
-        with open(cron_file, 'w') as file:
-            file.write(updated_crontab)
+        return self._add_job("timer", time.time() + duration)
+
+    def _add_job(self, job_type, fire_time, repeat_seconds=None):
+        job = {"id": uuid.uuid4().hex[:8], "type": job_type, "time": fire_time, "repeat_seconds": repeat_seconds}
+        with self.condition:
+            self.jobs[job["id"]] = job
+            heapq.heappush(self.heap, (fire_time, job["id"]))
+            self.save()
+            self.condition.notify()
+        print(f"{job_type.capitalize()} set for {datetime.fromtimestamp(fire_time)}")
+        return dict(job)
+
+    def list_jobs(self, job_type=None):
+        with self.condition:
+            jobs = [dict(job) for job in self.jobs.values() if job_type is None or job["type"] == job_type]
+        for job in jobs:
+            job["time_str"] = datetime.fromtimestamp(job["time"]).strftime('%Y-%m-%d %H:%M:%S')
+        return sorted(jobs, key=lambda job: job["time"])
+
+    def cancel_job(self, job_id):
+        # the job's heap entry is skipped when it comes up instead of being searched for now
+        with self.condition:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self.save()
+            self.condition.notify()
+        print(f"{job['type'].capitalize()} {job_id} cancelled.")
+        return True
 
-        # Apply the updated cron file
-        subprocess.run(['crontab', cron_file])
-
-        print(f"{job_type.capitalize()} set for {time_value}")
-
-    def _run_command_after_delay(self, delay, job_type):
-        if not self.cancel_event.wait(delay):
-            command = f"{self.python_exe} {trigger_script_path} {job_type}"
-            subprocess.run(command, shell=True)
-
-    def _add_scheduled_task(self, run_time, task_name, type):
-        today = datetime.now()
-        run_time_str = run_time.strftime('%H:%M:%S')
-        date_str = run_time.strftime('%Y-%m-%d')
-        theDate = today.strftime('%Y-%m-%d')+"T"+today.strftime('%H:%M:%S')
-        # use the scheduled_task.xml template to create the task so we can set the seconds position
-        with open(scheduled_task_xml_path, "r", encoding="utf-16") as file:
-            scheduled_task_xml = file.read()
-        scheduled_task_xml = scheduled_task_xml.replace("{{{URI}}}", task_name)
-        scheduled_task_xml = scheduled_task_xml.replace("{{{Command}}}", '"{}"'.format(self.python_exe))
-        scheduled_task_xml = scheduled_task_xml.replace("{{{Arguments}}}", '"{}" {}'.format(os.path.join(script_dir,trigger_script_path), type))
-        scheduled_task_xml = scheduled_task_xml.replace("{{{StartBoundary}}}", date_str+"T"+run_time_str)
-        scheduled_task_xml = scheduled_task_xml.replace("{{{Date}}}", theDate)
-        with tempfile.NamedTemporaryFile(suffix=".xml", mode='w', encoding='utf-16') as f:
-            f.write(scheduled_task_xml)
-            tempFile = f.name      
-            full_command = ["schtasks", "/create", "/xml", tempFile, "/tn", task_name, "/f"]
-            print(f"Running {type} command: " + " ".join(full_command))
-            subprocess.run(full_command)
+    def delete_all_jobs(self, job_type):
+        with self.condition:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job["type"] == job_type]:
+                del self.jobs[job_id]
+            self.save()
+            self.condition.notify()
+        print(f"All {job_type} jobs deleted.")
+
+    def load(self):
+        try:
+            with open(self.jobs_file, "r") as f:
+                jobs = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for job in jobs:
+            if job["time"] < now - missed_job_grace_seconds:
+                if not job.get("repeat_seconds"):
+                    print(f"Dropping {job['type']} {job['id']} missed at {datetime.fromtimestamp(job['time'])}.")
+                    continue
+                # move a repeating alarm to its next occurrence
+                missed = (now - job["time"]) // job["repeat_seconds"] + 1
+                job["time"] += missed * job["repeat_seconds"]
+            self.jobs[job["id"]] = job
+            heapq.heappush(self.heap, (job["time"], job["id"]))
+        if self.jobs:
+            print(f"Loaded {len(self.jobs)} alarms and timers.")
+
+    def save(self):
+        # called with the condition held
+        try:
+            with open(self.jobs_file + ".tmp", "w") as f:
+                json.dump(list(self.jobs.values()), f, indent=4)
+            os.replace(self.jobs_file + ".tmp", self.jobs_file)
+        except OSError as e:
+            print(f"Failed to save alarms and timers: {e}")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                job = None
+                while self.is_running:
+                    # drop heap entries of cancelled or rescheduled jobs
+                    while self.heap and (self.heap[0][1] not in self.jobs or self.jobs[self.heap[0][1]]["time"] != self.heap[0][0]):
+                        heapq.heappop(self.heap)
+                    if not self.heap:
+                        self.condition.wait()
+                        continue
+                    delay = self.heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    # wake up at least once a minute in case the wall clock was changed
+                    self.condition.wait(min(delay, 60))
+                if not self.is_running:
+                    return
+                _, job_id = heapq.heappop(self.heap)
+                job = self.jobs[job_id]
+                if job.get("repeat_seconds"):
+                    job["time"] += job["repeat_seconds"]
+                    heapq.heappush(self.heap, (job["time"], job_id))
+                else:
+                    del self.jobs[job_id]
+                self.save()
+            threading.Thread(target=self._fire, args=(job["type"],), daemon=True).start()
+
+    def _fire(self, job_type):
+        print(f"{job_type.capitalize()} went off!")
+        SoundEffectService().play(job_type)
 
     def cleanup(self):
         print("Cleaning up alarm_timer_service...")
-        self.cancel_event.set()  # Signal any running thread to stop
-        if self.timer_thread and self.timer_thread.is_alive():
-            self.timer_thread.join()
-        self.cancel_event.clear()
-
-    def delete_all_jobs(self, job_type):
-        if is_windows:
-            self._delete_all_scheduled_tasks(self.alarm_task_name if job_type == "alarm" else self.timer_task_name)
-        else:
-            if job_type == "timer":
-                self.cleanup()
-            self._delete_all_cron_jobs(job_type)
-
-    def _delete_all_scheduled_tasks(self, task_name):
-        command = ["schtasks", "/delete", "/tn", task_name, "/f"]
-        print(f"Deleting all {task_name} scheduled tasks...{' '.join(command)}")
-        subprocess.run(command)
-        print("Tasks deleted.")
-
-    def _delete_all_cron_jobs(self, job_type):
-        cron_file = self.alarm_cron_file if job_type == "alarm" else self.timer
-        if os.path.exists(cron_file):
-            os.remove(cron_file)
-            subprocess.run(['crontab', cron_file])
-            print(f"All {job_type} cron jobs deleted.")
\ No newline at end of file
+        with self.condition:
+            self.is_running = False
+            self.condition.notify()
+        if self.thread.is_alive() and self.thread != threading.current_thread():
+            self.thread.join()
@@ -1,5 +1,10 @@
+import argparse
+import time
 from math import ceil
-import spidev
+try:
+    import spidev
+except ImportError:
+    spidev = None  # not on a Pi; only FakeSpiDev can be used
 
 RGB_MAP = {
     "rgb": [3, 2, 1],
@@ -10,6 +15,33 @@ RGB_MAP = {
     "bgr": [1, 2, 3],
 }
 
+class FakeSpiDev:
+    """
+    Stands in for spidev.SpiDev off the Pi: counts the transfers and bytes sent and keeps
+    the last frame, so the LED code can be benchmarked and checked without a strip.
+    """
+
+    def __init__(self):
+        self.max_speed_hz = 0
+        self.transfers = 0
+        self.bytes_sent = 0
+        self.last_data = b""
+
+    def open(self, bus, device):
+        pass
+
+    def writebytes2(self, data):
+        self.transfers += 1
+        self.bytes_sent += len(data)
+        self.last_data = bytes(data)
+
+    def xfer2(self, data):
+        self.writebytes2(data)
+        return [0] * len(data)
+
+    def close(self):
+        pass
+
 class APA102:
     """
     Driver for APA102 LEDS (aka "DotStar").
@@ -29,6 +61,7 @@ class APA102:
         bus=0,
         device=1,
         max_speed_hz=8000000,
+        spi=None,
     ):
         self.num_led = num_led  # The number of LEDs in the Strip
         order = order.lower()
@@ -39,8 +72,19 @@ class APA102:
         else:
             self.global_brightness = global_brightness
 
-        self.leds = [self.LED_START, 0, 0, 0] * self.num_led  # Pixel buffer
-        self.spi = spidev.SpiDev()  # Init the SPI device
+        # Everything show() sends, preallocated: the start frame (32 zero bits), 4 bytes
+        # per pixel and the end frame (at least num_led/2 bits, see clock_end_frame)
+        end_frame_length = max(4, (self.num_led + 15) // 16)
+        self.buffer = bytearray(4 + 4 * self.num_led + end_frame_length)
+        self.buffer[4:4 + 4 * self.num_led] = bytes([self.LED_START, 0, 0, 0]) * self.num_led
+        self.buffer[4 + 4 * self.num_led:] = b"\xff" * end_frame_length
+        self.leds = memoryview(self.buffer)[4:4 + 4 * self.num_led]  # Pixel buffer
+        self.scratch = memoryview(bytearray(4 * self.num_led))  # for rotate()
+        if spi is None:
+            if spidev is None:
+                raise ImportError("spidev is needed to drive the LED strip (pass spi=FakeSpiDev() to run without one)")
+            spi = spidev.SpiDev()  # Init the SPI device
+        self.spi = spi
         self.spi.open(bus, device)  # Open SPI port 0, slave device (CS) 1
         # Up the speed a bit, so that the LEDs are painted faster
         if max_speed_hz:
@@ -138,23 +182,66 @@ class APA102:
         which means rotating in the opposite direction.
         """
         cutoff = 4 * (positions % self.num_led)
-        self.leds = self.leds[cutoff:] + self.leds[:cutoff]
+        if not cutoff:
+            return
+        length = len(self.leds)
+        # in place: park the head in scratch, shift the rest down (memoryview
+        # copies overlapping ranges safely), then put the head at the end
+        self.scratch[:cutoff] = self.leds[:cutoff]
+        self.leds[:length - cutoff] = self.leds[cutoff:]
+        self.leds[length - cutoff:] = self.scratch[:cutoff]
 
     def show(self):
         """Sends the content of the pixel buffer to the strip.
 
-        Todo: More than 1024 LEDs requires more than one xfer operation.
+        The start frame, pixels and end frame go out together from the preallocated
+        buffer: in one writebytes2 call (which splits long buffers itself), or with
+        older spidev versions in as few 4096 byte xfer2 calls as possible.
         """
-        self.clock_start_frame()
-        # xfer2 kills the list, unfortunately. So it must be copied first
-        # SPI takes up to 4096 Integers. So we are fine for up to 1024 LEDs.
-        data = list(self.leds)
-        while data:
-            self.spi.xfer2(data[:32])
-            data = data[32:]
-        self.clock_end_frame()
+        if hasattr(self.spi, "writebytes2"):
+            self.spi.writebytes2(self.buffer)
+            return
+        for start in range(0, len(self.buffer), 4096):
+            self.spi.xfer2(list(self.buffer[start:start + 4096]))
 
     def cleanup(self):
         """Release the SPI device; Call this method at the end"""
 
-        self.spi.close()  # Close SPI port
\ No newline at end of file
+        self.spi.close()  # Close SPI port
+
+def legacy_show(spi, leds):
+    # the driver's earlier show(): the list copied, 32 byte transfers and separate start/end frames
+    spi.xfer2([0] * 4)
+    data = list(leds)
+    while data:
+        spi.xfer2(data[:32])
+        data = data[32:]
+    spi.xfer2([0xFF] * 4)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks APA102.show() against a fake SPI device.")
+    parser.add_argument("--leds", type=int, default=3, help="number of LEDs on the strip")
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    strip = APA102(args.leds, spi=FakeSpiDev())
+    legacy_spi = FakeSpiDev()
+    legacy_leds = list(strip.leds)
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        legacy_show(legacy_spi, legacy_leds)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.frames):
+        strip.set_pixel(i % args.leds, 255, 0, 0)
+        strip.show()
+    seconds = time.perf_counter() - start
+
+    for name, spi, elapsed in (("legacy", legacy_spi, legacy_seconds), ("buffered", strip.spi, seconds)):
+        print(f"{name:>8}: {args.frames / elapsed:10.0f} frames/s, "
+              f"{spi.transfers / args.frames:5.1f} transfers and {spi.bytes_sent // args.frames} bytes per frame")
+    strip.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import collections
+import itertools
+import threading
+import numpy as np
+import pyaudio
+
+# higher priorities duck (lower the volume of) everything below them while they play
+PRIORITY_BACKGROUND = 0
+PRIORITY_EFFECT = 1
+PRIORITY_SPEECH = 2
+PRIORITY_ALARM = 3
+
+class MixerSource:
+    """
+    A sound playing (or queued) on the mixer.
+
+    Has the same stop()/wait_done()/is_playing() methods as a simpleaudio play object,
+    so callers that kept one of those can keep one of these instead.
+    """
+
+    def __init__(self, samples, priority, loop, gain):
+        self.samples = samples
+        self.priority = priority
+        self.loop = loop
+        self.gain = gain
+        self.current_gain = gain
+        self.position = 0
+        self.stopped = False
+        self.done = threading.Event()
+
+    def stop(self):
+        self.stopped = True
+        self.done.set()
+
+    def wait_done(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def is_playing(self):
+        return not self.done.is_set()
+
+class AudioMixer:
+    """
+    One output stream for every sound the app plays.
+
+    The PyAudio output stream is opened once and its callback mixes whatever sources are
+    active, so starting a sound is just adding it to a list. Sources on the same named
+    channel play one after another without a gap (the next one starts in the same
+    buffer the previous one ends in); sources without a channel play straight away.
+    While a source plays, lower priority sources are ducked to duck_gain, with the gain
+    ramped across one buffer to avoid clicks.
+    """
+
+    def __init__(self, sample_rate=44100, channels=2, frames_per_buffer=1024, duck_gain=0.3):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.duck_gain = duck_gain
+        self.lock = threading.Lock()
+        self.queues = collections.OrderedDict()
+        self.anonymous_channels = itertools.count()
+        self.mix_buffer = np.zeros((frames_per_buffer * 4, channels), dtype=np.float32)
+        self.pa = pyaudio.PyAudio()
+        self.stream = self.pa.open(
+            format=pyaudio.paInt16,
+            channels=channels,
+            rate=sample_rate,
+            output=True,
+            frames_per_buffer=frames_per_buffer,
+            stream_callback=self._callback,
+        )
+
+    def to_samples(self, segment):
+        # converts a pydub AudioSegment to the mixer's rate/channels as an int16 (frames, channels) array
+        segment = segment.set_frame_rate(self.sample_rate).set_channels(self.channels).set_sample_width(2)
+        return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, self.channels)
+
+    def convert(self, samples, sample_rate):
+        # converts int16 samples ((frames,) or (frames, channels)) at sample_rate to the mixer's rate/channels with numpy
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        if sample_rate != self.sample_rate and len(samples):
+            positions = np.arange(int(round(len(samples) * self.sample_rate / sample_rate))) * (sample_rate / self.sample_rate)
+            frames = np.arange(len(samples))
+            samples = np.stack([np.interp(positions, frames, samples[:, i]) for i in range(samples.shape[1])], axis=1)
+        if samples.shape[1] != self.channels:
+            samples = np.repeat(samples.mean(axis=1, keepdims=True), self.channels, axis=1)
+        return samples.astype(np.int16)
+
+    def play(self, samples, priority=PRIORITY_EFFECT, loop=False, gain=1.0, channel=None):
+        """
+        Starts playing samples (an int16 (frames, channels) array or a pydub AudioSegment).
+
+        With a channel name, the sound is queued behind anything already on that channel.
+        Returns the MixerSource.
+        """
+        if not isinstance(samples, np.ndarray):
+            samples = self.to_samples(samples)
+        source = MixerSource(samples, priority, loop, gain)
+        if not len(samples):
+            source.done.set()
+            return source
+        with self.lock:
+            if channel is None:
+                channel = f"_{next(self.anonymous_channels)}"
+            self.queues.setdefault(channel, collections.deque()).append(source)
+        return source
+
+    def stop_channel(self, channel):
+        with self.lock:
+            for source in self.queues.pop(channel, ()):
+                source.stop()
+
+    def stop_all(self):
+        with self.lock:
+            for sources in self.queues.values():
+                for source in sources:
+                    source.stop()
+            self.queues.clear()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if frame_count > len(self.mix_buffer):
+            self.mix_buffer = np.zeros((frame_count, self.channels), dtype=np.float32)
+        out = self.mix_buffer[:frame_count]
+        out[:] = 0
+        with self.lock:
+            for channel in list(self.queues):
+                sources = self.queues[channel]
+                while sources and sources[0].stopped:
+                    sources.popleft()
+                if not sources:
+                    del self.queues[channel]
+            top_priority = max((sources[0].priority for sources in self.queues.values()), default=0)
+            for channel, sources in list(self.queues.items()):
+                self._mix_channel(sources, out, frame_count, top_priority)
+                if not sources:
+                    del self.queues[channel]
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16).tobytes(), pyaudio.paContinue
+
+    def _mix_channel(self, sources, out, frame_count, top_priority):
+        written = 0
+        while sources and written < frame_count:
+            source = sources[0]
+            if source.stopped:
+                # stopped while it was still waiting its turn
+                sources.popleft()
+                continue
+            target_gain = source.gain * (self.duck_gain if source.priority < top_priority else 1.0)
+            count = min(frame_count - written, len(source.samples) - source.position)
+            chunk = source.samples[source.position:source.position + count]
+            if target_gain != source.current_gain:
+                ramp = np.linspace(source.current_gain, target_gain, count, dtype=np.float32)[:, None]
+                out[written:written + count] += chunk * ramp
+                source.current_gain = target_gain
+            else:
+                out[written:written + count] += chunk * target_gain
+            written += count
+            source.position += count
+            if source.position >= len(source.samples):
+                if source.loop:
+                    source.position = 0
+                else:
+                    sources.popleft()
+                    source.done.set()
+
+    def close(self):
+        self.stop_all()
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pa.terminate()
+
+audio_mixer = None
+audio_mixer_lock = threading.Lock()
+
+def get_audio_mixer():
+    global audio_mixer
+    with audio_mixer_lock:
+        if audio_mixer is None:
+            audio_mixer = AudioMixer()
+        return audio_mixer
@@ -0,0 +1,196 @@
+import threading
+import time
+import numpy as np
+
+class AudioRingBuffer:
+    """
+    Fixed-size int16 ring buffer between the PyAudio callback and the wake word consumer.
+
+    The storage is allocated once. The capture callback copies each chunk in with
+    write(), and the consumer pulls frame_size windows with read_frame(). Windows that
+    don't straddle the end of the ring are returned as views into the storage, so the
+    consumer must be done with a frame before the writer laps it (capacity covers
+    num_frames frames of audio). When the consumer falls behind, the oldest audio is
+    dropped and counted in overruns / dropped_samples instead of growing memory.
+    """
+
+    def __init__(self, frame_size, num_frames=64):
+        self.frame_size = frame_size
+        self.capacity = frame_size * num_frames
+        self.buffer = np.zeros(self.capacity, dtype=np.int16)
+        # scratch frame used when a window wraps around the end of the ring
+        self.scratch = np.zeros(frame_size, dtype=np.int16)
+        self.write_pos = 0  # total samples ever written
+        self.read_pos = 0  # total samples ever read
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.cond = threading.Condition()
+
+    def write(self, in_data):
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        total = count = len(samples)
+        if count > self.capacity:
+            # only the newest audio fits, the rest is dropped straight away
+            samples = samples[-self.capacity:]
+            count = self.capacity
+        with self.cond:
+            start = (self.write_pos + total - count) % self.capacity
+            first = min(count, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            if first < count:
+                self.buffer[:count - first] = samples[first:]
+            self.write_pos += total
+            unread = self.write_pos - self.read_pos
+            if unread > self.capacity:
+                # drop the oldest audio, keeping the read position on a frame boundary
+                dropped = unread - self.capacity
+                dropped += -dropped % self.frame_size
+                self.read_pos += dropped
+                self.overruns += 1
+                self.dropped_samples += dropped
+            self.cond.notify()
+
+    def available(self):
+        with self.cond:
+            return self.write_pos - self.read_pos
+
+    def read_frame(self, timeout=None):
+        """Returns the next frame_size window, or None if it isn't ready before timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.write_pos - self.read_pos >= self.frame_size, timeout):
+                return None
+            start = self.read_pos % self.capacity
+            self.read_pos += self.frame_size
+            end = start + self.frame_size
+            if end <= self.capacity:
+                return self.buffer[start:end]
+            first = self.capacity - start
+            self.scratch[:first] = self.buffer[start:]
+            self.scratch[first:] = self.buffer[:self.frame_size - first]
+            return self.scratch
+
+    def read_bytes(self, num_samples, timeout=None):
+        """Copies out the next num_samples as bytes; returns what's there (maybe b"") if timeout expires first."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.write_pos - self.read_pos >= num_samples, timeout)
+            num_samples = min(num_samples, self.write_pos - self.read_pos)
+            start = self.read_pos % self.capacity
+            first = min(num_samples, self.capacity - start)
+            data = self.buffer[start:start + first].tobytes()
+            if first < num_samples:
+                data += self.buffer[:num_samples - first].tobytes()
+            self.read_pos += num_samples
+            return data
+
+    def tell(self):
+        with self.cond:
+            return self.read_pos
+
+    def write_position(self):
+        with self.cond:
+            return self.write_pos
+
+    def seek(self, position):
+        # move the read position, limited to the audio still held in the ring
+        with self.cond:
+            self.read_pos = max(self.write_pos - self.capacity, min(position, self.write_pos))
+
+    def clear(self):
+        # discard anything unread, e.g. audio captured while the assistant was busy
+        with self.cond:
+            self.read_pos = self.write_pos
+
+    def stats(self):
+        with self.cond:
+            return {
+                "capacity": self.capacity,
+                "unread": self.write_pos - self.read_pos,
+                "overruns": self.overruns,
+                "dropped_samples": self.dropped_samples,
+            }
+
+class SharedAudioRingBuffer:
+    """
+    Single-producer / single-consumer int16 ring buffer in shared memory.
+
+    Used to feed the wake word worker process (wakeword_worker.py). The creating
+    process writes from the PyAudio callback and publishes the total sample count in
+    a shared header; the other process attaches by name and keeps its own read
+    position. The writer never waits for the reader, so a reader that falls more than
+    a ring behind skips ahead to the newest audio and counts the overrun.
+    """
+
+    HEADER_BYTES = 8
+
+    def __init__(self, frame_size, num_frames=64, name=None):
+        from multiprocessing import shared_memory
+        self.frame_size = frame_size
+        self.capacity = frame_size * num_frames
+        self.owner = name is None
+        size = self.HEADER_BYTES + self.capacity * 2
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        if not self.owner:
+            # the attaching process must not unlink the segment when it exits
+            from multiprocessing import resource_tracker
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.buffer = np.ndarray((self.capacity,), dtype=np.int16, buffer=self.shm.buf, offset=self.HEADER_BYTES)
+        if self.owner:
+            self.header[0] = 0
+        # frames are copied out so the writer can't change them while they're being scored
+        self.scratch = np.zeros(frame_size, dtype=np.int16)
+        self.read_pos = int(self.header[0])
+        self.overruns = 0
+        self.dropped_samples = 0
+
+    def write(self, in_data):
+        samples = np.frombuffer(in_data, dtype=np.int16)[-self.capacity:]
+        write_pos = int(self.header[0])
+        count = len(samples)
+        start = write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        if first < count:
+            self.buffer[:count - first] = samples[first:]
+        # publish the new samples only after they've been copied in
+        self.header[0] = write_pos + count
+
+    def read_frame(self, timeout=None, poll_interval=0.01):
+        """Returns a copy of the next frame_size window, or None if it isn't ready before timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            write_pos = int(self.header[0])
+            unread = write_pos - self.read_pos
+            # leave a frame of slack so we never read a region the writer is filling
+            if unread > self.capacity - self.frame_size:
+                dropped = unread - (self.capacity - self.frame_size)
+                dropped += -dropped % self.frame_size
+                self.read_pos += dropped
+                self.overruns += 1
+                self.dropped_samples += dropped
+                unread -= dropped
+            if unread >= self.frame_size:
+                start = self.read_pos % self.capacity
+                first = min(self.frame_size, self.capacity - start)
+                self.scratch[:first] = self.buffer[start:start + first]
+                if first < self.frame_size:
+                    self.scratch[first:] = self.buffer[:self.frame_size - first]
+                self.read_pos += self.frame_size
+                return self.scratch
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def clear(self):
+        self.read_pos = int(self.header[0])
+
+    def close(self):
+        self.header = None
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -1,26 +1,30 @@
 #import os
 #from os import environ
 #environ['OPENAI_LOG'] = 'debug'
-import openai
-from groq import Groq
 import urllib
-import geocoder
 import time
 from datetime import date, datetime
+import json
+import os
 import requests
 from tzlocal import get_localzone
+from http_pool import get_http_pool
+from sentence_segmenter import SentenceSegmenter
 
 class ChatGPTService:
     def __init__(self, config):
         self.append2log = None
+        self.http_pool = get_http_pool()
         self.use_groq = config["use_groq"]
+        # only the client library in use is imported
         if (self.use_groq):
+            from groq import Groq
             self.model = config["groq_model"]
-            self.llm = Groq(api_key=config["groq_key"])
+            self.llm = Groq(api_key=config["groq_key"], http_client=self.http_pool.httpx_client)
         else:
-            openai.api_key = config["openai_key"]
+            import openai
             self.model = config["openai_model"]
-            self.llm = openai
+            self.llm = openai.OpenAI(api_key=config["openai_key"], http_client=self.http_pool.httpx_client)
         self.assistant_name = config["assistant_dict"]["name"]
         self.assistant_acronym = config["assistant_dict"]["acronym"]
         self.assistant_descr = config["assistant_dict"]["descr"]
@@ -35,10 +39,17 @@ class ChatGPTService:
         self.sound_effect = None
         self.imgur_client_id = config["imgur_client_id"]
         self.use_imgur = config["use_imgur"]
+        self.segmenter = SentenceSegmenter(
+            first_clause_words=config.get("tts_first_clause_words", 8),
+            min_chars=config.get("tts_min_chunk_chars", 15),
+        )
+        # when set, each streamed answer is saved as [seconds, delta] pairs for sentence_segmenter.py's benchmark
+        self.stream_recording_dir = config.get("llm_stream_recording_dir", "")
 
     def get_current_location(self):
         try:
-            g = geocoder.ip('me')
+            import geocoder
+            g = geocoder.ip('me', session=self.http_pool.session)
             print(f"Current location: {g.city}, {g.state}, {g.country}")
             return g.city
         except Exception as e:
@@ -64,14 +75,14 @@ class ChatGPTService:
         url = weather_location_and_url["weather_url"]
         try:
             print(f"Getting weather information from: {url}")
-            with urllib.request.urlopen(url) as response:
-                if response.status == 200:
-                    return f"Current and forecast weather json data for ({location_unparsed}) (source: {url}): {response.read()}"
-                else:
-                    print("Weather information is not available at the moment.")
-                    return ""
-        except urllib.error.URLError as e:
-            print(f"Failed to get weather information: {e.reason}")
+            response = self.http_pool.session.get(url, timeout=10)
+            if response.status_code == 200:
+                return f"Current and forecast weather json data for ({location_unparsed}) (source: {url}): {response.content}"
+            else:
+                print("Weather information is not available at the moment.")
+                return ""
+        except requests.RequestException as e:
+            print(f"Failed to get weather information: {e}")
             return ""
         
     def upload_image_to_imgur(self, image_data):
@@ -85,7 +96,7 @@ class ChatGPTService:
         }
         print("Uploading image to imgur...")
         #print(image_data)
-        response = requests.post(url, headers=headers, data=payload)
+        response = self.http_pool.session.post(url, headers=headers, data=payload)
         link = ''
         if response.status_code == 200:
             data = response.json()
@@ -103,6 +114,13 @@ class ChatGPTService:
             print("Response:", response.json())
         return link
 
+    def add_to_history(self, request, response):
+        # used when a request was answered without calling the LLM (e.g. from the response cache)
+        self.history.append({"role": "user", "content": request})
+        self.history.append({"role": "assistant", "content": response})
+        if len(self.history) > 5:
+            self.history = [self.history[0]] + self.history[-4:]
+
     def send_to_chat_gpt(self, request, image=None, image_link=''):
         if not self.use_groq and image is not None:
             if self.use_imgur:
@@ -125,6 +143,7 @@ class ChatGPTService:
         if len(self.history) > 5:
             self.history = [self.history[0]] + self.history[-4:]
         result = None
+        request_time = time.time()
         try:
             #print(self.history)
             response = self.llm.chat.completions.create(
@@ -142,22 +161,23 @@ class ChatGPTService:
 
         def text_iterator():
             response_full_text = ""
-            sentence = ""
-            sentence_endings = {'.', '!', '?'}
+            recording = []
+            self.segmenter.reset()
             #print(f"{self.assistant_name}: ", end="")
             self.append2log(f"{self.assistant_name}: ", True)
             for chunk in response:
                 delta = chunk.choices[0].delta
                 if delta.content:
-                    sentence += delta.content.replace('\n', ' ')
                     response_full_text += delta.content.replace('\n', ' ')
-                    # Check if the current character ends the sentence
-                    if delta.content[-1] in sentence_endings:
+                    if self.stream_recording_dir:
+                        recording.append([round(time.time() - request_time, 4), delta.content])
+                    # yield every sentence (or early first clause) the delta completed
+                    for sentence in self.segmenter.feed(delta.content):
                         #print(sentence, end="")
-                        self.append2log(sentence, True)
+                        self.append2log(sentence + " ", True)
                         yield sentence
-                        sentence = ""
             # Yield any remaining text after the loop ends
+            sentence = self.segmenter.flush()
             if sentence:
                 #print(sentence)
                 self.append2log(sentence)
@@ -165,5 +185,17 @@ class ChatGPTService:
             else:
                 self.append2log("")
             self.history.append({"role": "assistant", "content": response_full_text})
+            if recording:
+                self.save_stream_recording(recording)
         
         return text_iterator()
+
+    def save_stream_recording(self, recording):
+        try:
+            if not os.path.exists(self.stream_recording_dir):
+                os.makedirs(self.stream_recording_dir)
+            filename = os.path.join(self.stream_recording_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(recording, f)
+        except OSError as e:
+            print(f"Failed to save LLM stream recording: {e}")
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date as dt_date
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CHATLOG_FILENAME_PATTERN = re.compile(r"^(?P<assistant>.+)_chatlog-(?P<date>\d{4}-\d{2}-\d{2})\.txt$")
+
+class ChatHistory:
+    """
+    SQLite index of the chat logs with full-text search.
+
+    The text logs in chatlogs/ stay the source of truth. sync() reads only the bytes
+    appended to each log since the last sync and stores them as messages (a message
+    starts at a "You: " or "<assistant name>: " line and runs until the next one).
+    Today's last message is left for a later sync, since it may still be being
+    written; logs of past days are ingested to the end. Messages are indexed with FTS5
+    when SQLite has it, and searched with LIKE otherwise.
+    """
+
+    def __init__(self, db_file, chatlog_dir, assistants):
+        self.chatlog_dir = chatlog_dir
+        self.assistants = assistants
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                assistant TEXT NOT NULL,
+                date TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_assistant_date ON messages (assistant, date, id);
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                filename TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+        """)
+        try:
+            self.db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(message, content='messages', content_rowid='id', tokenize='porter unicode61');
+                CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+                END;
+            """)
+            self.use_fts = True
+        except sqlite3.OperationalError:
+            print("SQLite was built without FTS5, chat history search will be slower.")
+            self.use_fts = False
+        self.db.commit()
+
+    def sync(self):
+        """Ingests whatever was added to the chat logs since the last sync. Returns the number of new messages."""
+        if not os.path.exists(self.chatlog_dir):
+            return 0
+        added = 0
+        today = str(dt_date.today())
+        with self.lock:
+            ingested = {row["filename"]: row for row in self.db.execute("SELECT * FROM ingested_files")}
+            for filename in sorted(os.listdir(self.chatlog_dir)):
+                match = CHATLOG_FILENAME_PATTERN.match(filename)
+                if not match:
+                    continue
+                path = os.path.join(self.chatlog_dir, filename)
+                size = os.path.getsize(path)
+                state = ingested.get(filename)
+                complete = match.group("date") < today
+                # a past day's log doesn't grow, but its last message is still held back
+                # until the first sync after midnight
+                if state is not None and state["size"] == size and not (complete and state["offset"] < size):
+                    continue
+                added += self._ingest(path, filename, match.group("assistant"), match.group("date"), state["offset"] if state else 0, size, complete)
+            self.db.commit()
+        return added
+
+    def _ingest(self, path, filename, assistant, date, offset, size, complete):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        assistant_name = self.assistants.get(assistant, {}).get("name", assistant.capitalize())
+        prefixes = (b"You: ", f"{assistant_name}: ".encode("utf-8"))
+        # byte offsets (relative to offset) where a message starts
+        starts = [0]
+        position = 0
+        for line in data.splitlines(keepends=True):
+            if position and line.startswith(prefixes):
+                starts.append(position)
+            position += len(line)
+        if complete:
+            starts += [position, position]
+        elif not data.endswith(b"\n"):
+            # a half-written last line: wait for the rest of it
+            position = data.rfind(b"\n") + 1
+            starts = [start for start in starts if start < position] + [position]
+        else:
+            starts.append(position)
+        if len(starts) < 2:
+            # not even one complete line yet (e.g. "You: ..." still waiting for the answer)
+            self.db.execute("INSERT OR REPLACE INTO ingested_files (filename, offset, size) VALUES (?, ?, ?)", (filename, offset, size))
+            return 0
+        # everything up to the start of the last message is complete
+        messages = []
+        for begin, end in zip(starts[:-2], starts[1:-1]):
+            message = data[begin:end].decode("utf-8", errors="replace").strip()
+            if message:
+                messages.append((assistant, date, message))
+        self.db.executemany("INSERT INTO messages (assistant, date, message) VALUES (?, ?, ?)", messages)
+        new_offset = offset + starts[-2]
+        self.db.execute("INSERT OR REPLACE INTO ingested_files (filename, offset, size) VALUES (?, ?, ?)", (filename, new_offset, size))
+        return len(messages)
+
+    def get_messages(self, assistant, date, after_id=None, before_id=None, limit=None):
+        """
+        Messages of one day in order. after_id fetches only newer ones (incremental updates),
+        before_id with limit pages backwards from the newest.
+        """
+        self.sync()
+        query = "SELECT id, message FROM messages WHERE assistant = ? AND date = ?"
+        params = [assistant, date]
+        if after_id is not None:
+            query += " AND id > ?"
+            params.append(after_id)
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+        messages = [{"id": row["id"], "message": row["message"]} for row in reversed(rows)]
+        if before_id is None:
+            # messages still being written aren't in the database yet
+            messages += [{"id": None, "message": message} for message in self._pending_messages(assistant, date)]
+        return messages
+
+    def _pending_messages(self, assistant, date):
+        filename = f"{assistant}_chatlog-{date}.txt"
+        with self.lock:
+            row = self.db.execute("SELECT offset FROM ingested_files WHERE filename = ?", (filename,)).fetchone()
+        try:
+            with open(os.path.join(self.chatlog_dir, filename), "rb") as f:
+                f.seek(row["offset"] if row else 0)
+                text = f.read().decode("utf-8", errors="replace")
+        except OSError:
+            return []
+        assistant_name = self.assistants.get(assistant, {}).get("name", assistant.capitalize())
+        messages = []
+        for line in text.splitlines(keepends=True):
+            if not messages or line.startswith(("You: ", f"{assistant_name}: ")):
+                messages.append(line)
+            else:
+                messages[-1] += line
+        return [message.strip() for message in messages if message.strip()]
+
+    def search(self, text, assistant=None, limit=50, offset=0):
+        """Searches every date (and every assistant unless one is given), newest first."""
+        self.sync()
+        terms = text.split()
+        if not terms:
+            return []
+        params = []
+        if self.use_fts:
+            # quote each word so punctuation in the search isn't read as FTS syntax
+            query = ("SELECT m.id, m.assistant, m.date, m.message, snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet "
+                     "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ?")
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in terms))
+        else:
+            query = "SELECT m.id, m.assistant, m.date, m.message, m.message AS snippet FROM messages m WHERE 1"
+            for term in terms:
+                query += " AND m.message LIKE ?"
+                params.append(f"%{term}%")
+        if assistant:
+            query += " AND m.assistant = ?"
+            params.append(assistant)
+        query += " ORDER BY m.id DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self.lock:
+            return [dict(row) for row in self.db.execute(query, params)]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Imports the text chat logs into the chat history database.")
+    parser.add_argument("--search", help="search the history after importing")
+    args = parser.parse_args()
+    with open(os.path.join(script_dir, "assistants.json")) as f:
+        assistants = json.load(f)
+    history = ChatHistory(os.path.join(script_dir, "chat_history.db"), os.path.join(script_dir, "chatlogs"), assistants)
+    print(f"Imported {history.sync()} messages.")
+    if args.search:
+        for result in history.search(args.search):
+            print(f"{result['date']} {result['assistant']}: {result['snippet']}")
+    history.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import queue
+import threading
+import time
+
+class ChatLogWriter:
+    """
+    Appends chat log text and sends the matching UI updates from a background thread.
+
+    write() only puts the text on a bounded queue, so the speech path never waits on
+    the disk or the socket. The writer thread takes everything queued (waiting at most
+    flush_interval for more), writes it with one call per file and flushes. Files stay
+    open between batches; close() writes what's left, fsyncs and closes them. Anything
+    written after close() is appended straight to the file, with a warning.
+    """
+
+    def __init__(self, emit=None, max_queue=1000, flush_interval=0.25):
+        self.emit = emit
+        self.flush_interval = flush_interval
+        self.entries = queue.Queue(maxsize=max_queue)
+        self.files = {}
+        self.lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.last_write_ms = 0.0
+        self.max_write_ms = 0.0
+        self.total_write_ms = 0.0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="chat_log_writer", daemon=True)
+        self.thread.start()
+
+    def write(self, filename, text, message=None):
+        # message: what to send to the web UI once the text is written, if anything
+        with self.lock:
+            if not self.closed:
+                try:
+                    self.entries.put_nowait((filename, text, message))
+                except queue.Full:
+                    self.dropped += 1
+                    print(f"Chat log queue full, dropped: {text.strip()}")
+                    return
+                self.max_queue_depth = max(self.max_queue_depth, self.entries.qsize())
+                return
+        # the writer thread is gone, so nothing would ever take this off the queue
+        print(f"Chat log written after close: {text.strip()}")
+        try:
+            with open(filename, "a", encoding='utf-8') as f:
+                f.write(text)
+        except OSError as e:
+            print(f"Failed to write chat log {filename}: {e}")
+
+    def _run(self):
+        while True:
+            entry = self.entries.get()
+            batch = [entry]
+            deadline = time.time() + self.flush_interval
+            # gather whatever else arrives in the next flush_interval into the same write
+            while entry is not None:
+                try:
+                    entry = self.entries.get(timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                batch.append(entry)
+            closing = batch[-1] is None
+            self._write_batch([entry for entry in batch if entry is not None])
+            if closing:
+                self._close_files()
+                return
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        start = time.perf_counter()
+        texts = {}
+        for filename, text, _ in batch:
+            texts.setdefault(filename, []).append(text)
+        for filename, parts in texts.items():
+            try:
+                f = self._open(filename)
+                f.write("".join(parts))
+                f.flush()
+            except OSError as e:
+                print(f"Failed to write chat log {filename}: {e}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_write_ms = elapsed_ms
+            self.max_write_ms = max(self.max_write_ms, elapsed_ms)
+            self.total_write_ms += elapsed_ms
+        if self.emit is not None:
+            for _, _, message in batch:
+                if message:
+                    try:
+                        self.emit(message)
+                    except Exception as e:
+                        print(f"Failed to send chat update: {e}")
+
+    def _open(self, filename):
+        f = self.files.get(filename)
+        if f is None:
+            # a new day's log means yesterday's won't be written to again
+            self._close_files()
+            f = open(filename, "a", encoding='utf-8')
+            self.files[filename] = f
+        return f
+
+    def _close_files(self):
+        for filename, f in self.files.items():
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+            except OSError as e:
+                print(f"Failed to close chat log {filename}: {e}")
+        self.files = {}
+
+    def close(self, timeout=5):
+        """Writes everything queued, fsyncs and closes the log files."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        try:
+            # a full queue with a dead or stuck writer thread would otherwise block forever
+            self.entries.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"Chat log writer isn't keeping up, {self.entries.qsize()} entries may not be written.")
+            return
+        self.thread.join(timeout)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queue_depth": self.entries.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "last_write_ms": round(self.last_write_ms, 3),
+                "max_write_ms": round(self.max_write_ms, 3),
+                "avg_write_ms": round(self.total_write_ms / self.batches, 3) if self.batches else 0.0,
+            }
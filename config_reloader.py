@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+# the parts of the running app that are rebuilt when one of their settings changes
+CONFIG_COMPONENTS = OrderedDict([
+    ("wake_word", {"assistant", "oww_model", "max_threshold", "oww_preload_all_assistants", "oww_listen_for_all_assistants"}),
+    ("chat", {"assistant", "openai_key", "openai_model", "groq_key", "groq_model", "use_groq", "system_prompt",
+              "imgur_client_id", "imgur_client_secret", "use_imgur", "tts_first_clause_words", "tts_min_chunk_chars",
+              "llm_stream_recording_dir"}),
+    ("speech", {"assistant", "elevenlabs_key", "use_elevenlabs", "use_gtts", "language", "tts_lookahead",
+                "tts_cache_enabled", "tts_cache_max_mb"}),
+    ("sound_effects", {"assistant"}),
+    ("listener", {"language", "dynamic_energy_threshold", "timeout", "phrase_time_limit", "stt_backend", "vosk_model_path"}),
+    ("led", {"led_brightness"}),
+])
+
+# settings that are read from config each time they're used, so nothing has to be rebuilt
+LIVE_SETTINGS = {"radio_stream_url", "kids_radio_stream_url", "upload_folder", "vad_threshold", "print_audio_level",
+                 "noise_floor_gate_ratio", "listen_pre_roll_seconds", "chat_page_size", "http_warm_up", "windows_task_author"}
+
+# kept in config by main.py at runtime, not settings
+RUNTIME_KEYS = {"old_assistant", "assistant_dict"}
+
+def changed_settings(old_config, new_config):
+    """The names of the settings whose values differ between two configs."""
+    keys = (set(old_config) | set(new_config)) - RUNTIME_KEYS
+    return sorted(key for key in keys if old_config.get(key) != new_config.get(key))
+
+def plan_reload(changed):
+    """
+    Works out what a config change needs: returns (components, restart_required).
+
+    components lists the CONFIG_COMPONENTS to rebuild, in rebuild order. A setting
+    that isn't known here (the audio format, the worker process, the frontend...) can
+    only be applied by a full restart, so restart_required is True.
+    """
+    changed = set(changed)
+    components = [name for name, settings in CONFIG_COMPONENTS.items() if changed & settings]
+    known = LIVE_SETTINGS.union(*CONFIG_COMPONENTS.values())
+    return components, bool(changed - known)
@@ -0,0 +1,106 @@
+import collections
+import threading
+import time
+
+class EventBus:
+    """
+    Sends events to the web UI from one thread, so publishers never wait on SocketIO.
+
+    publish() only records the event. Events on a coalesced topic (like the audio level)
+    keep just their latest value and go out at most rate_hz times a second; other
+    events are queued and sent in order as soon as the sender thread wakes up, after
+    any coalesced values published before them so a stale audio level or partial
+    transcript can't overwrite the state change that followed it. Each
+    topic tracks how many events were published, emitted and coalesced away, and the
+    delay between publishing and emitting.
+    """
+
+    def __init__(self, emit, rate_hz=10, coalesced_topics=(), max_queue=1000):
+        self.emit = emit
+        self.interval = 1 / rate_hz
+        self.coalesced_topics = set(coalesced_topics)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.queue = collections.deque()
+        self.max_queue = max_queue
+        self.latest = {}
+        self.last_emit_times = {}
+        self.topic_stats = {}
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, name="event_bus", daemon=True)
+        self.thread.start()
+
+    def _stats(self, topic):
+        # called with the lock held
+        stats = self.topic_stats.get(topic)
+        if stats is None:
+            stats = {"published": 0, "emitted": 0, "coalesced": 0, "dropped": 0, "total_latency_ms": 0.0, "max_latency_ms": 0.0}
+            self.topic_stats[topic] = stats
+        return stats
+
+    def publish(self, topic, data):
+        now = time.perf_counter()
+        with self.lock:
+            stats = self._stats(topic)
+            stats["published"] += 1
+            if topic in self.coalesced_topics:
+                if topic in self.latest:
+                    stats["coalesced"] += 1
+                self.latest[topic] = (data, now)
+                # the sender picks it up on its next tick
+                return
+            if len(self.queue) >= self.max_queue:
+                stats["dropped"] += 1
+                return
+            # pending coalesced values go out ahead of this event
+            for pending_topic, (pending_data, published) in sorted(self.latest.items(), key=lambda item: item[1][1]):
+                self.queue.append((pending_topic, pending_data, published))
+            self.latest.clear()
+            self.queue.append((topic, data, now))
+        self.wakeup.set()
+
+    def _run(self):
+        while self.is_running:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            now = time.perf_counter()
+            with self.lock:
+                events = list(self.queue)
+                self.queue.clear()
+                for topic, (data, published) in list(self.latest.items()):
+                    if now - self.last_emit_times.get(topic, 0) >= self.interval:
+                        events.append((topic, data, published))
+                        del self.latest[topic]
+                for topic, _, _ in events:
+                    if topic in self.coalesced_topics:
+                        self.last_emit_times[topic] = now
+            for topic, data, published in events:
+                try:
+                    self.emit(topic, data)
+                except Exception as e:
+                    print(f"Failed to emit {topic}: {e}")
+                latency_ms = (time.perf_counter() - published) * 1000
+                with self.lock:
+                    stats = self._stats(topic)
+                    stats["emitted"] += 1
+                    stats["total_latency_ms"] += latency_ms
+                    stats["max_latency_ms"] = max(stats["max_latency_ms"], latency_ms)
+
+    def stats(self):
+        with self.lock:
+            return {
+                topic: {
+                    "published": stats["published"],
+                    "emitted": stats["emitted"],
+                    "coalesced": stats["coalesced"],
+                    "dropped": stats["dropped"],
+                    "avg_latency_ms": round(stats["total_latency_ms"] / stats["emitted"], 3) if stats["emitted"] else 0.0,
+                    "max_latency_ms": round(stats["max_latency_ms"], 3),
+                }
+                for topic, stats in self.topic_stats.items()
+            }
+
+    def stop(self):
+        self.is_running = False
+        self.wakeup.set()
+        self.thread.join(1)
@@ -0,0 +1,94 @@
+import threading
+from urllib.parse import urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+class HttpPool:
+    """
+    Keep-alive connection pools shared by every outbound HTTP call in the app.
+
+    The OpenAI, Groq and ElevenLabs SDKs are handed httpx_client; imgur uploads,
+    weather and geolocation lookups and the internet check use session. Both live for
+    the whole process, so rebuilding the services on restart doesn't throw away open
+    connections. Per-host request and connection counts show how often a connection
+    was reused.
+    """
+
+    def __init__(self, pool_maxsize=10, keepalive_expiry=300, timeout=30):
+        self.lock = threading.Lock()
+        self.host_stats = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.hooks["response"].append(self._record_requests_response)
+        self.httpx_client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize, keepalive_expiry=keepalive_expiry),
+            event_hooks={"request": [self._trace_httpx_request], "response": [self._record_httpx_response]},
+        )
+
+    def _record(self, host, requests=0, connections=0):
+        with self.lock:
+            stats = self.host_stats.setdefault(host, {"requests": 0, "connections": 0})
+            stats["requests"] += requests
+            stats["connections"] += connections
+
+    def _record_requests_response(self, response, *args, **kwargs):
+        # urllib3 keeps its connections in the pool; each is counted the first time it serves a response
+        connection = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+        is_new = connection is not None and not getattr(connection, "http_pool_counted", False)
+        if is_new:
+            connection.http_pool_counted = True
+        self._record(urlsplit(response.url).netloc, requests=1, connections=int(is_new))
+
+    def _trace_httpx_request(self, request):
+        # httpcore reports a new connection through the trace extension
+        host = request.url.netloc.decode("ascii")
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                self._record(host, connections=1)
+        request.extensions["trace"] = trace
+
+    def _record_httpx_response(self, response):
+        self._record(response.request.url.netloc.decode("ascii"), requests=1)
+
+    def warm_up(self, requests_urls=(), httpx_urls=()):
+        # open connections (DNS, TCP, TLS) before the first real request needs them
+        def run():
+            for url in requests_urls:
+                try:
+                    self.session.head(url, timeout=5)
+                except requests.RequestException as e:
+                    print(f"Failed to warm up connection to {url}: {e}")
+            for url in httpx_urls:
+                try:
+                    self.httpx_client.head(url, timeout=5)
+                except httpx.HTTPError as e:
+                    print(f"Failed to warm up connection to {url}: {e}")
+            print(f"HTTP connections warmed up: {self.stats()}")
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self.lock:
+            return {
+                host: {
+                    "requests": stats["requests"],
+                    "connections": stats["connections"],
+                    "reused": stats["requests"] - stats["connections"],
+                }
+                for host, stats in self.host_stats.items()
+            }
+
+http_pool = None
+http_pool_lock = threading.Lock()
+
+def get_http_pool():
+    global http_pool
+    with http_pool_lock:
+        if http_pool is None:
+            http_pool = HttpPool()
+        return http_pool
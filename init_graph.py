@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class InitGraph:
+    """
+    Builds the app's components on a thread pool, each as soon as the ones it depends on are built.
+
+    add() declares a component with the function that builds it and the components it
+    needs, whose values are passed to that function in order. A component that raises
+    is reported and left out; only the components depending on it are skipped, the rest
+    still get built. result() waits for one component (raising its error), wait() for
+    all of them. Each component's build time is timed, and recorded as a phase on the
+    startup profiler when one is given.
+    """
+
+    def __init__(self, max_workers=4, profiler=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="init")
+        self.profiler = profiler
+        self.components = {}
+        self.futures = {}
+        self.timings = {}
+        self.submitted = set()
+        self.done_callbacks = []
+        self.remaining = 0
+        self.is_done = False
+        self.lock = threading.Lock()
+
+    def add(self, name, build, depends_on=()):
+        for dependency in depends_on:
+            if dependency not in self.components:
+                raise ValueError(f"{name} depends on {dependency}, which hasn't been added")
+        self.components[name] = (build, tuple(depends_on))
+        self.futures[name] = Future()
+
+    def start(self):
+        with self.lock:
+            self.remaining = len(self.components)
+            ready = [name for name, (_, depends_on) in self.components.items() if not depends_on]
+            self.submitted.update(ready)
+        for name in ready:
+            self.executor.submit(self._build, name)
+        if not self.components:
+            self._finish()
+        return self
+
+    def _build(self, name):
+        build, depends_on = self.components[name]
+        future = self.futures[name]
+        failed = [dependency for dependency in depends_on if self.futures[dependency].exception() is not None]
+        start = time.perf_counter()
+        if failed:
+            print(f"Skipping {name}, {failed[0]} failed to initialize.")
+            future.set_exception(RuntimeError(f"{name} wasn't initialized because {failed[0]} failed"))
+            status = "skipped"
+        else:
+            try:
+                if self.profiler is not None:
+                    with self.profiler.phase(name):
+                        value = build(*[self.futures[dependency].result() for dependency in depends_on])
+                else:
+                    value = build(*[self.futures[dependency].result() for dependency in depends_on])
+                future.set_result(value)
+                status = "ok"
+            except Exception as e:
+                print(f"Failed to initialize {name}: {e}")
+                future.set_exception(e)
+                status = "failed"
+        with self.lock:
+            self.timings[name] = {
+                "status": status,
+                "seconds": round(time.perf_counter() - start, 3),
+                "thread": threading.current_thread().name,
+            }
+            self.remaining -= 1
+            finished = self.remaining == 0
+        # start whatever was only waiting on this component
+        for dependent, (_, dependent_depends_on) in self.components.items():
+            if name in dependent_depends_on and all(self.futures[dependency].done() for dependency in dependent_depends_on):
+                with self.lock:
+                    if dependent in self.submitted:
+                        continue
+                    self.submitted.add(dependent)
+                self.executor.submit(self._build, dependent)
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        with self.lock:
+            self.is_done = True
+            callbacks, self.done_callbacks = self.done_callbacks, []
+        self.executor.shutdown(wait=False)
+        for callback in callbacks:
+            callback()
+
+    def result(self, name, timeout=None):
+        """The built component; raises the error it failed with."""
+        return self.futures[name].result(timeout)
+
+    def get(self, name, default=None):
+        """The built component, or default if it failed or was skipped."""
+        future = self.futures[name]
+        return future.result() if future.exception() is None else default
+
+    def wait(self, default=None):
+        """Waits for every component and returns {name: component}, with default for the failed ones."""
+        return {name: self.get(name, default) for name in self.components}
+
+    def on_done(self, callback):
+        # calls callback once every component has been built (straight away if they already have)
+        with self.lock:
+            if not self.is_done:
+                self.done_callbacks.append(callback)
+                return
+        callback()
+
+    def stats(self):
+        with self.lock:
+            return {name: dict(timing) for name, timing in self.timings.items()}
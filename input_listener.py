@@ -1,39 +1,138 @@
+import numpy as np
 import speech_recognition as sr
+from stt_backends import StreamingSTTBackend, get_stt_backend
+
+class RingBufferSource(sr.AudioSource):
+    """
+    Lets speech_recognition record from WakeWordDetector's always-open capture stream
+    (an AudioRingBuffer) instead of opening its own sr.Microphone.
+    """
+
+    def __init__(self, audio_buffer, sample_rate, chunk_size):
+        self.audio_buffer = audio_buffer
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.stream = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def read(self, size):
+        # give up after a couple of seconds so a dead capture stream ends the recording
+        return self.audio_buffer.read_bytes(size, timeout=2)
+
+# keeps the threshold usable if the mic reports near digital silence
+MIN_ENERGY_THRESHOLD = 100
 
 class InputListener:
-    def __init__(self, config):
+    def __init__(self, config, source=None, noise_floor=None):
         self.rec = sr.Recognizer()
-        self.mic = sr.Microphone()
+        self.mic = source if source is not None else sr.Microphone()
         self.rec.dynamic_energy_threshold = config["dynamic_energy_threshold"]
         self.rec.energy_threshold = config["vad_threshold"]
         self.timeout = config["timeout"]
         self.phrase_time_limit = config["phrase_time_limit"]
         self.language = config["language"] + "-US"
         self.sound_effect = None
+        self.backend = get_stt_backend(config, self.rec)
+        self.on_partial_transcript = None
+        self.streamed_transcript = None
+        self.is_prepared = False
 
-        with self.mic as source:
-            print("Adjusting for ambient noise...")
-            self.rec.adjust_for_ambient_noise(source, duration=1)
+        if noise_floor is not None and noise_floor.rms is not None:
+            # background estimate from the capture stream, no need to block for a calibration
+            self.apply_noise_floor(noise_floor.rms)
+        else:
+            with self.mic as source:
+                print("Adjusting for ambient noise...")
+                self.rec.adjust_for_ambient_noise(source, duration=1)
+
+    def apply_noise_floor(self, rms):
+        # same target adjust_for_ambient_noise converges to
+        self.rec.energy_threshold = max(rms * self.rec.dynamic_energy_ratio, MIN_ENERGY_THRESHOLD)
+
+    def prepare(self):
+        # called while the wake sound plays so recognition can start on the first chunk
+        if isinstance(self.backend, StreamingSTTBackend) and not self.is_prepared:
+            self.backend.start(self.mic.SAMPLE_RATE)
+            self.is_prepared = True
 
     def listen(self):
         if self.sound_effect is not None:
           self.sound_effect.stop_sound()
         self.audio_data = None
+        self.streamed_transcript = None
         with self.mic as source:
             try:
-                print("Listening for request...")                    
-                self.audio_data = self.rec.listen(source, timeout = self.timeout, phrase_time_limit = self.phrase_time_limit)
+                print("Listening for request...")
+                if isinstance(self.backend, StreamingSTTBackend):
+                    self.listen_streaming(source)
+                else:
+                    self.audio_data = self.rec.listen(source, timeout = self.timeout, phrase_time_limit = self.phrase_time_limit)
             except Exception:
                 pass
 
+    def listen_streaming(self, source):
+        # Feed the backend while recording so the transcript is ready as soon as the user stops talking
+        chunk_seconds = source.CHUNK / source.SAMPLE_RATE
+        if not self.is_prepared:
+            self.backend.start(source.SAMPLE_RATE)
+        self.is_prepared = False
+        speech_started = False
+        waited = 0
+        phrase_seconds = 0
+        silence_seconds = 0
+        last_partial = ""
+        while True:
+            buffer = source.stream.read(source.CHUNK)
+            if len(buffer) == 0:
+                break
+            partial = self.backend.accept_audio(buffer)
+            if partial and partial != last_partial:
+                last_partial = partial
+                if self.on_partial_transcript is not None:
+                    self.on_partial_transcript(partial)
+            samples = np.frombuffer(buffer, dtype=np.int16).astype(np.float32)
+            energy = np.sqrt(np.mean(samples * samples)) if len(samples) else 0
+            if energy > self.rec.energy_threshold:
+                speech_started = True
+                silence_seconds = 0
+            elif speech_started:
+                silence_seconds += chunk_seconds
+                if silence_seconds > self.rec.pause_threshold:
+                    break
+            if speech_started:
+                phrase_seconds += chunk_seconds
+                if self.phrase_time_limit and phrase_seconds > self.phrase_time_limit:
+                    break
+            else:
+                waited += chunk_seconds
+                if self.timeout and waited > self.timeout:
+                    break
+        final_transcript = self.backend.finish()
+        if speech_started:
+            self.streamed_transcript = final_transcript
+
     def transcribe(self):
         self.transcript = None
+        if isinstance(self.backend, StreamingSTTBackend):
+            # already decoded while listening
+            self.transcript = self.streamed_transcript
+            if self.transcript is None:
+                print("No audio request detected.")
+            if self.sound_effect is not None:
+              self.sound_effect.stop_sound()
+            return None
         if self.audio_data is None:
             print("No audio request detected.")
             return None
         try:
             print("Processing speech request to text...")
-            self.transcript = self.rec.recognize_google(self.audio_data, language=self.language)
+            self.transcript = self.backend.transcribe(self.audio_data)
         except sr.UnknownValueError as e:
                 # Handle the case where the speech is unintelligible
                 print(f"Could not understand audio. {e}")
@@ -0,0 +1,284 @@
+import re
+import time
+
+# Trigger phrases for requests handled locally instead of by the LLM.
+# When a transcript contains phrases from more than one intent, the one listed first wins.
+DEFAULT_INTENTS = [
+    ("time", [
+        "what time is it",
+        "what is the time",
+        "what is the current time",
+        "what's the time",
+        "what's the current time",
+        "do you have the time",
+        "do you have the current time",
+        "do you know the time",
+        "do you know the current time",
+        "tell me the time",
+        "tell me the current time",
+        "tell me what time it is",
+    ]),
+    ("radio", [
+        "play radio",
+        "play music",
+        "play some music",
+        "play some radio",
+        "play some tunes",
+        "play some songs",
+        "play the radio",
+        "play the music",
+        "play the tunes",
+        "play the songs",
+    ]),
+    ("kids_radio", [
+        "play kids radio",
+        "play kids music",
+        "play kids songs",
+        "play kids tunes",
+        "play kid radio",
+        "play kid music",
+        "play kid songs",
+        "play kid tunes",
+        "play the kids radio",
+        "play the kids music",
+        "play the kids songs",
+        "play the kids tunes",
+        "play the kid radio",
+        "play the kid music",
+        "play the kid songs",
+        "play the kid tunes",
+        "play children's radio",
+        "play children's music",
+        "play children's songs",
+        "play children's tunes",
+        "play the children's radio",
+        "play the children's music",
+        "play the children's songs",
+        "play the children's tunes",
+    ]),
+    ("stop_radio", [
+        "stop playing",
+        "stop the radio",
+        "stop the music",
+        "stop the tunes",
+        "stop the songs",
+        "stop music",
+        "stop radio",
+        "stop tunes",
+        "stop songs",
+        "stop playing music",
+        "stop playing radio",
+        "stop playing tunes",
+        "stop playing songs",
+    ]),
+    ("set_alarm", [
+        "set an alarm",
+        "set a alarm",
+        "set alarm",
+        "set the alarm",
+        "wake me up",
+    ]),
+    ("set_timer", [
+        "set a timer",
+        "set timer",
+        "set the timer",
+    ]),
+    ("delete_alarms", [
+        "delete all alarm",
+        "reset all alarm",
+        "turn off all alarm",
+        "cancel all alarm",
+        "clear all alarm",
+        "forget all alarm",
+        "delete alarm",
+        "reset alarm",
+        "turn off alarm",
+        "cancel alarm",
+        "clear alarm",
+        "forget alarm",
+    ]),
+    ("delete_timers", [
+        "delete all timer",
+        "reset all timer",
+        "turn off all timer",
+        "cancel all timer",
+        "clear all timer",
+        "forget all timer",
+        "delete timer",
+        "reset timer",
+        "turn off timer",
+        "cancel timer",
+        "clear timer",
+        "forget timer",
+    ]),
+    ("change_assistant", [
+        "change assistant",
+        "switch assistant",
+        "change the assistant",
+        "switch the assistant",
+        "change voice assistant",
+        "switch voice assistant",
+        "change the voice assistant",
+        "switch the voice assistant",
+        "change the voice",
+        "switch the voice",
+        "change voice",
+        "switch voice",
+        "change your voice",
+        "switch your voice",
+        "change your name",
+        "switch your name",
+    ]),
+]
+# matched against the transcript as it is rather than lowercased, like the original checks
+CASE_SENSITIVE_INTENTS = {"time"}
+
+def _trie_pattern(node):
+    # Builds a regex from a character trie so phrases sharing a prefix are only scanned once
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char != ""]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # a phrase ends here, but prefer the longer phrase if it matches too
+        if len(branches) == 1 and len(pattern) > 1:
+            pattern = "(?:" + pattern + ")"
+        pattern += "?"
+    return pattern
+
+class Intent:
+    def __init__(self, name, phrases, handler, guard=None, priority=0, case_sensitive=False):
+        self.name = name
+        self.phrases = phrases
+        self.handler = handler
+        self.guard = guard
+        self.priority = priority
+        self.case_sensitive = case_sensitive
+
+class PhraseMatcher:
+    # every phrase found anywhere in a text, from one trie-shaped regex
+    def __init__(self, phrases):
+        self.phrases = phrases
+        trie = {}
+        for phrase in phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self.pattern = re.compile("(?=(" + _trie_pattern(trie) + "))") if trie else None
+        self.lengths = sorted({len(phrase) for phrase in phrases})
+
+    def find(self, text):
+        if self.pattern is None:
+            return set()
+        found = set()
+        for longest in set(self.pattern.findall(text)):
+            # the regex only reports the longest phrase at each position; the shorter
+            # phrases there are the ones it starts with
+            for length in self.lengths:
+                if length > len(longest):
+                    break
+                if longest[:length] in self.phrases:
+                    found.add(longest[:length])
+        return found
+
+class IntentRouter:
+    """
+    Matches a transcript against every registered trigger phrase in one pass.
+
+    All phrases are compiled into a single trie-shaped regex inside a lookahead, so
+    overlapping matches are found at every position of the lowercased transcript in
+    one scan, however many intents are registered (case-sensitive intents get a
+    second regex over the transcript as it is). Every phrase found counts, including
+    ones that are the start of a longer phrase, and the matched intents are tried in
+    registration order; an intent's guard can still reject the transcript.
+    """
+
+    def __init__(self):
+        self.intents = []
+        self.phrase_intents = {}
+        self.case_sensitive_phrase_intents = {}
+        self.matchers = None
+
+    def register(self, name, phrases, handler, guard=None, case_sensitive=False):
+        intent = Intent(name, phrases, handler, guard, len(self.intents), case_sensitive)
+        self.intents.append(intent)
+        for phrase in phrases:
+            if case_sensitive:
+                self.case_sensitive_phrase_intents.setdefault(phrase, []).append(intent)
+            else:
+                self.phrase_intents.setdefault(phrase.lower(), []).append(intent)
+        self.matchers = None
+        return intent
+
+    def compile(self):
+        self.matchers = (PhraseMatcher(self.phrase_intents), PhraseMatcher(self.case_sensitive_phrase_intents))
+
+    def match(self, transcript):
+        if self.matchers is None:
+            self.compile()
+        matcher, case_sensitive_matcher = self.matchers
+        matched = set()
+        for found in matcher.find(transcript.lower()):
+            matched.update(self.phrase_intents[found])
+        for found in case_sensitive_matcher.find(transcript):
+            matched.update(self.case_sensitive_phrase_intents[found])
+        for intent in sorted(matched, key=lambda intent: intent.priority):
+            if intent.guard is None or intent.guard(transcript):
+                return intent
+        return None
+
+    def route(self, transcript, *args):
+        intent = self.match(transcript)
+        if intent is None:
+            return False
+        intent.handler(transcript, *args)
+        return True
+
+def _legacy_match(intents, transcript):
+    # the phrase-list cascade process_transcript used before the router
+    for name, phrases in intents:
+        text = transcript if name in CASE_SENSITIVE_INTENTS else transcript.lower()
+        if any(phrase in text for phrase in phrases):
+            return name
+    return None
+
+def benchmark(iterations=20000, extra_intents=(0, 50, 200)):
+    transcripts = [
+        "What time is it?",
+        "Hey, can you play the kids radio please",
+        "set a timer for 10 minutes",
+        "Tell me a joke about a dinosaur who loves pancakes and goes to school",
+        "Why is the sky blue and why do clouds float in the air instead of falling down",
+        "change your name to Bluey",
+    ]
+    for extra in extra_intents:
+        intents = list(DEFAULT_INTENTS) + [
+            (f"extra_{i}", [f"custom command {i} variant {j}" for j in range(10)]) for i in range(extra)
+        ]
+        router = IntentRouter()
+        for name, phrases in intents:
+            router.register(name, phrases, None, case_sensitive=name in CASE_SENSITIVE_INTENTS)
+        router.compile()
+        for transcript in transcripts:
+            matched = router.match(transcript)
+            assert (matched.name if matched else None) == _legacy_match(intents, transcript), transcript
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for transcript in transcripts:
+                _legacy_match(intents, transcript)
+        legacy = (time.perf_counter() - start) / (iterations * len(transcripts)) * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for transcript in transcripts:
+                router.match(transcript)
+        compiled = (time.perf_counter() - start) / (iterations * len(transcripts)) * 1e6
+
+        phrase_count = sum(len(phrases) for _, phrases in intents)
+        print(f"{len(intents)} intents / {phrase_count} phrases: "
+              f"cascade {legacy:.1f} us, router {compiled:.1f} us per transcript")
+
+if __name__ == "__main__":
+    benchmark()
@@ -72,6 +72,14 @@ class LEDService:
             self.leds = APA102(num_led=NUM_LEDS)
         self.current_color = _BLACK
 
+    def set_brightness(self, led_brightness):
+        self.led_brightness = led_brightness
+        self.leds.global_brightness = min(led_brightness, self.leds.MAX_BRIGHTNESS)
+        # redraw the current color at the new brightness
+        rgb = self.current_color
+        self.current_color = None
+        self.set_color(rgb)
+
     def turn_off(self):
         self.handle_event("Off")
         self.leds.cleanup()
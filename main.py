@@ -1,31 +1,45 @@
+from startup_profiler import get_startup_profiler
+startup_profiler = get_startup_profiler()
 import base64
 import collections
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 import gc
+import importlib.util
 import json
 import os
 import platform
-import queue
 import re
 import signal
 import sys
 import time
 from typing import Iterable
-import numpy as np
 from chat_gpt_service import ChatGPTService
-from input_listener import InputListener
-import openwakeword
-from openwakeword.model import Model
 import pyaudio
 from sound_effect_service import SoundEffectService
 from tts_service import TextToSpeechService
 from alarm_timer_service import AlarmTimerService
+from audio_ring_buffer import AudioRingBuffer
+from wake_word_scorer import WakeWordScorer, wake_word_setup
+from wakeword_worker import WakeWordWorker
+from input_listener import InputListener, RingBufferSource
+from noise_floor import NoiseFloorEstimator
+from intent_router import CASE_SENSITIVE_INTENTS, DEFAULT_INTENTS, IntentRouter
+from response_cache import ResponseCache
+from http_pool import get_http_pool
+from tts_cache import get_tts_cache
+from chat_log_writer import ChatLogWriter
+from chat_history import ChatHistory
+from event_bus import EventBus
+from config_reloader import RUNTIME_KEYS, changed_settings, plan_reload
+from init_graph import InitGraph
 import threading
 from flask import Flask, jsonify, render_template, send_from_directory, request
 from flask_socketio import SocketIO
 from werkzeug.utils import secure_filename
 import requests
 from radio_player import RadioPlayer
+startup_profiler.mark("imports")
 
 transcript_seperator = f"_"*40
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -45,9 +59,9 @@ is_rpi = False
 loading_sound = None
 file_chunks = {}
 is_exiting = False
-
-# One-time download of all pre-trained models (or only select models)
-openwakeword.utils.download_models()
+# held by apply_config() and for the whole of a request, so settings never change under a running request.
+# reentrant because a request can change settings itself (switching assistants)
+reload_lock = threading.RLock()
 
 def is_running_on_raspberry_pi():
     try:
@@ -60,6 +74,21 @@ def is_running_on_raspberry_pi():
         pass
     return False
 
+def ensure_wake_word_models():
+    # openWakeWord's feature, VAD and "hey jarvis" models are downloaded once; once they're
+    # on disk this is a directory listing and openWakeWord isn't even imported
+    framework = config["oww_model"].split(".")[-1]
+    spec = importlib.util.find_spec("openwakeword")
+    if spec is not None:
+        models_dir = os.path.join(spec.submodule_search_locations[0], "resources", "models")
+        present = os.listdir(models_dir) if os.path.isdir(models_dir) else []
+        needed = [f"embedding_model.{framework}", f"melspectrogram.{framework}", "silero_vad.onnx"]
+        if all(name in present for name in needed) and any(name.startswith("hey_jarvis") and name.endswith(framework) for name in present):
+            return
+    print("Downloading openWakeWord models...")
+    import openwakeword.utils
+    openwakeword.utils.download_models(model_names=["hey_jarvis"])
+
 config_file = os.path.join(script_dir, "config.json")
 assistants_file = os.path.join(script_dir, "assistants.json")
 print(f"Loading config from {config_file}...")
@@ -74,6 +103,24 @@ assistant_acronym = assistant["acronym"]
 vad_threshold = config["vad_threshold"]
 print_audio_level = config["print_audio_level"]
 max_threshold = config["max_threshold"]
+startup_profiler.mark("config")
+
+with startup_profiler.phase("wake word model download"):
+    ensure_wake_word_models()
+
+response_cache = None
+if config.get("response_cache_enabled", True):
+    response_cache = ResponseCache(
+        os.path.join(script_dir, "response_cache"),
+        ttl_seconds=config.get("response_cache_ttl_seconds", 7 * 24 * 3600),
+        max_entries=config.get("response_cache_max_entries", 200),
+        max_bytes=config.get("response_cache_max_mb", 50) * 1024 * 1024,
+    )
+
+# estimated continuously from the mic stream and kept across restarts
+noise_floor = None
+if config.get("adaptive_noise_floor", True):
+    noise_floor = NoiseFloorEstimator(os.path.join(script_dir, "noise_floor.json"))
 
 if not os.path.exists("chatlogs"):
     os.makedirs("chatlogs")
@@ -92,24 +139,39 @@ if is_rpi:
         print("Make sure you're running this on a Raspberry Pi.")
 else:
     print("LED event: Starting")
+startup_profiler.mark("caches and LEDs")
 
 if config["use_frontend"]:
     app = Flask(__name__)
     socketio = SocketIO(app, async_mode='threading')
+startup_profiler.mark("Flask app")
 
 def getChatFilename(dateStr):    
     chatlog_filename = os.path.join(script_dir, "chatlogs", f"{config['assistant']}_chatlog-{dateStr}.txt")
     return chatlog_filename
 
+def emit_ui_event(event, data):
+    if socketio is not None:
+        socketio.emit(event, data)
+
+# every update for the web UI goes out from the bus's thread; the audio level and partial
+# transcripts only keep their latest value and are sent at most ui_event_rate_hz times a second
+event_bus = EventBus(emit_ui_event, rate_hz=config.get("ui_event_rate_hz", 10), coalesced_topics=("processing_audio", "partial_transcript"))
+
+def emit_chat_update(message):
+    event_bus.publish('update_chat', {'message': message})
+
+chat_log_writer = ChatLogWriter(emit_chat_update)
+chat_history = ChatHistory(os.path.join(script_dir, "chat_history.db"), os.path.join(script_dir, "chatlogs"), assistants)
+# how many of the latest messages a page shows before "Show earlier messages" is needed
+chat_page_size = config.get("chat_page_size", 50)
+
 # save conversation to a log file 
 def append2log(text, noNewLine=False):
+    # queued for the log writer thread, which also sends the update to the web UI
     chatlog_filename = getChatFilename(str(date.today()))
-    with open(chatlog_filename, "a", encoding='utf-8') as f:
-        f.write(text + ("\n" if not noNewLine else ""))
-        f.close
-    
-    if text and text != transcript_seperator:
-        socketio.emit('update_chat', {'message': text.strip()})
+    message = text.strip() if text and text != transcript_seperator else None
+    chat_log_writer.write(chatlog_filename, text + ("\n" if not noNewLine else ""), message)
 
 class ShairportSyncHandler:
     def __init__(self, wakeword_detector, radio_player):
@@ -136,7 +198,7 @@ class ShairportSyncHandler:
                         self.blink_led_thread = threading.Thread(target=self.blink_led)
                         self.blink_led_thread.start()
                         print("Pausing chatbot vad...")
-                        socketio.emit('music_active', {'status': 'ready'})
+                        event_bus.publish('music_active', {'status': 'ready'})
                 else:
                     if self.shairport_active:
                         self.shairport_active = False
@@ -145,7 +207,7 @@ class ShairportSyncHandler:
                             self.blink_led_thread.join()
                         self.wakeword_detector.handle_led_event("Running")
                         print("Resuming chatbot vad...")
-                        socketio.emit('music_active', {'status': 'done'})
+                        event_bus.publish('music_active', {'status': 'done'})
             except dbus.DBusException as e:
                 print(f"Error communicating with Shairport Sync: {e}")
             time.sleep(1)
@@ -175,17 +237,6 @@ class ShairportSyncHandler:
         
 class WakeWordDetector:
     def __init__(self):
-        self.chat_gpt_service = ChatGPTService(config)
-        self.chat_gpt_service.append2log = append2log
-        oww_model_path = os.path.join(script_dir, "oww_models", config["oww_model"].replace("{assistant_name}", assistant_name))
-        oww_additional = config["oww_model"].replace("{assistant_name}", f"{assistant_name}1")
-        oww_model_path1 = os.path.join(script_dir, "oww_models", oww_additional) if os.path.exists(os.path.join(script_dir, "oww_models", oww_additional)) else None
-        oww_models = [oww_model_path]
-        if oww_model_path1:
-            oww_models.append(oww_model_path1)
-        if assistant_name.lower() == "jarvis":
-            oww_models.append("hey jarvis")
-        oww_inference_framework = config["oww_model"].split(".")[-1]
         self.language = config["language"]
         self.oww_chunk_size = config["oww_chunk_size"]
         self.oww_sample_rate = config["oww_sample_rate"]
@@ -193,96 +244,329 @@ class WakeWordDetector:
         self.is_request_processing = False
         self.is_awoken = False
         self.use_elevenlabs = config["use_elevenlabs"]
-        self.audio_queue = queue.Queue()
+        self.audio_buffer = AudioRingBuffer(self.oww_chunk_size, config.get("oww_ring_buffer_frames", 64))
         self.is_running = True
         self.consumer_thread = None
         self.restart_app = False
         self.mic_stream = None
+        self.vad_threshold = vad_threshold
+        self.effective_vad_threshold = vad_threshold
+        self.noise_gate_ratio = config.get("noise_floor_gate_ratio", 1.5)
 
-        self.handle = Model(
-            wakeword_models=oww_models, 
-            inference_framework=oww_inference_framework,
-            vad_threshold=vad_threshold/max_threshold,
-        )
+        self.handle = None
+        self.scorer = None
+        self.wakeword_worker = None
+        self.oww_pool_key = None
+        self.oww_listening_for = None
+        self.wake_assistant = None
+        # one capture stream feeds both the wake word detector and command recording.
+        # it's opened here so the listener can calibrate from it and stays open until cleanup.
+        self.listen_pre_roll_samples = int(config.get("listen_pre_roll_seconds", 1.0) * self.oww_sample_rate)
+        self.wake_position = None
+        self.last_overruns = 0
+        self.pa = None
+        self.listener = None
+        self.chat_gpt_service = None
+        self.speech = None
+        self.sound_effect = None
 
+        # independent parts are built at the same time. The wake word loop only needs the
+        # models, the mic stream and the listener; the LLM client, TTS and sound effects
+        # carry on in the background; run() waits for them before announcing it's ready and
+        # stops the app if one of them failed (see wait_for_components).
+        self.init_graph = InitGraph(max_workers=4, profiler=startup_profiler)
+        self.init_graph.add("wake word models", self._load_wake_word_models)
+        self.init_graph.add("PyAudio", self._create_pyaudio)
+        self.init_graph.add("mic stream", self._open_mic_stream, depends_on=("PyAudio",))
+        self.init_graph.add("listener calibration", self._create_listener, depends_on=("mic stream",))
+        self.init_graph.add("LLM client", self._create_chat_gpt_service)
+        self.init_graph.add("TTS", lambda: TextToSpeechService(config))
+        self.init_graph.add("sound effects", self._create_sound_effect_service)
+        self.init_graph.start()
+        self.components_ready = False
+        # without these the detector can't run, so their errors are raised here
+        self.init_graph.result("wake word models")
+        self.listener = self.init_graph.result("listener calibration")
+
+        self.intent_router = self.build_intent_router()
+        # runs network work (LLM request, STT set up) while cue sounds play
+        self.dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dispatch")
+
+    def _load_wake_word_models(self):
+        # loads the wake word model(s), replacing any already loaded. With oww_preload_all_assistants
+        # every assistant's models are loaded into one model (sharing the audio features), so
+        # switching assistants only changes which of them are listened for.
+        # (wakeword_benchmark.py replays audio through the same setup)
+        model_owners, thresholds, listening_for = wake_word_setup(config, assistants, os.path.join(script_dir, "oww_models"))
+        pool_key = (config["oww_model"], max_threshold, tuple(thresholds))
+        if pool_key == self.oww_pool_key:
+            print("Wake word models already loaded.")
+            self._set_listening_for(listening_for)
+            return
+        self.oww_pool_key = pool_key
+        self.oww_listening_for = listening_for
+        self.oww_model_owners = model_owners
+        self.oww_thresholds = thresholds
+        self.oww_models = list(self.oww_model_owners)
+        self.oww_inference_framework = config["oww_model"].split(".")[-1]
+        if config.get("oww_use_worker_process", False):
+            # run inference in a separate process fed through shared memory
+            old_worker = self.wakeword_worker
+            self._start_wakeword_worker()
+            if old_worker is not None:
+                old_worker.stop()
+                if not self.is_awoken and not self.is_request_processing:
+                    self.wakeword_worker.resume()
+        else:
+            from openwakeword.model import Model
+            handle = Model(
+                wakeword_models=self.oww_models, 
+                inference_framework=self.oww_inference_framework,
+                vad_threshold=vad_threshold/max_threshold,
+            )
+            scorer = WakeWordScorer(handle, self.effective_vad_threshold, sample_rate=self.oww_sample_rate,
+                                    model_owners=self.oww_model_owners, thresholds=self.oww_thresholds)
+            scorer.listening_for = listening_for
+            if self.scorer is not None:
+                scorer.last_audio_level_over_threshold = self.scorer.last_audio_level_over_threshold
+            # audio_consumer picks up the new scorer on its next frame
+            self.handle, self.scorer = handle, scorer
+
+    def _set_listening_for(self, listening_for):
+        # None listens for every loaded assistant's wake word
+        self.oww_listening_for = listening_for
+        if self.wakeword_worker is not None:
+            self.wakeword_worker.set_listening_for(listening_for)
+        elif self.scorer is not None:
+            self.scorer.listening_for = listening_for
+
+    def _create_pyaudio(self):
         self.pa = pyaudio.PyAudio()
-        
-        #stop loading sound so we can test ambient noise properly
-        loading_sound.stop_sound()
-        self.listener = InputListener(config)
-
-        self.speech = TextToSpeechService(config)
 
-        self.sound_effect = SoundEffectService(config)        
+    def _create_chat_gpt_service(self):
+        chat_gpt_service = ChatGPTService(config)
+        chat_gpt_service.append2log = append2log
+        return chat_gpt_service
+
+    def _create_sound_effect_service(self):
+        sound_effect = SoundEffectService(config)
+        threading.Thread(target=sound_effect.preload, daemon=True).start()
+        return sound_effect
+
+    def wait_for_components(self):
+        # blocks until the components built in the background are ready (only the first time).
+        # nothing can be answered without them, so a failed one raises its error instead of leaving None
+        if self.components_ready:
+            return
+        chat_gpt_service = self.init_graph.result("LLM client")
+        speech = self.init_graph.result("TTS")
+        sound_effect = self.init_graph.result("sound effects")
+        if not self.components_ready:
+            self.chat_gpt_service = chat_gpt_service
+            self.speech = speech
+            self.sound_effect = sound_effect
+            self.components_ready = True
+
+    def _create_listener(self):
+        if noise_floor is None or noise_floor.rms is None:
+            #stop loading sound so we can test ambient noise properly
+            if loading_sound is not None:
+                loading_sound.stop_sound()
+        listener = InputListener(config, RingBufferSource(self.audio_buffer, self.oww_sample_rate, self.oww_chunk_size), noise_floor)
+        listener.on_partial_transcript = lambda text: event_bus.publish('partial_transcript', {'message': text})
+        return listener
+
+    def reload(self, components):
+        """Rebuilds the given components (see config_reloader.CONFIG_COMPONENTS) from the current config."""
+        self.wait_for_components()
+        start_time = time.time()
+        if "wake_word" in components:
+            self._load_wake_word_models()
+        if "chat" in components:
+            chat_gpt_service = self._create_chat_gpt_service()
+            if self.chat_gpt_service is not None and self.chat_gpt_service.sound_effect is not None:
+                # the old service's loading loop would have nothing left to stop it
+                self.chat_gpt_service.sound_effect.stop_sound()
+            if self.chat_gpt_service is not None and chat_gpt_service.assistant_name == self.chat_gpt_service.assistant_name:
+                # same persona, so carry on the conversation
+                chat_gpt_service.history += self.chat_gpt_service.history[1:]
+            self.chat_gpt_service = chat_gpt_service
+        if "speech" in components:
+            speech = TextToSpeechService(config)
+            if self.speech is not None:
+                self.speech.stop()
+            self.speech = speech
+            self.use_elevenlabs = config["use_elevenlabs"]
+        if "sound_effects" in components:
+            if self.sound_effect is not None:
+                self.sound_effect.stop_sound()
+            self.sound_effect = self._create_sound_effect_service()
+        if "listener" in components:
+            self.language = config["language"]
+            if self.listener is not None and self.listener.sound_effect is not None:
+                self.listener.sound_effect.stop_sound()
+            self.listener = self._create_listener()
+        print(f"Reloaded {', '.join(components)} in {round(time.time() - start_time, 2)} seconds.")
+
+    def _start_wakeword_worker(self):
+        self.wakeword_worker = WakeWordWorker(
+            self.oww_models,
+            self.oww_inference_framework,
+            # the noise-raised gate, like the in-process scorer; apply_noise_floor only sends changes
+            self.effective_vad_threshold,
+            max_threshold,
+            self.oww_chunk_size,
+            self.oww_sample_rate,
+            config.get("oww_ring_buffer_frames", 64),
+            model_owners=self.oww_model_owners,
+            thresholds=self.oww_thresholds,
+        )
+        self.wakeword_worker.set_listening_for(self.oww_listening_for)
+
+    def set_vad_threshold(self, new_threshold):
+        self.vad_threshold = new_threshold
+        self.apply_noise_floor()
+
+    def apply_noise_floor(self):
+        # the gate never drops below the configured vad_threshold, but rises with a noisy room
+        gate_threshold = self.vad_threshold
+        if noise_floor is not None and noise_floor.level is not None:
+            gate_threshold = max(self.vad_threshold, noise_floor.level * self.noise_gate_ratio)
+            self.listener.apply_noise_floor(noise_floor.rms)
+            noise_floor.save_if_due()
+        if gate_threshold == self.effective_vad_threshold:
+            return
+        self.effective_vad_threshold = gate_threshold
+        if self.wakeword_worker is not None:
+            self.wakeword_worker.set_vad_threshold(gate_threshold)
+        elif self.scorer is not None:
+            self.scorer.vad_threshold = gate_threshold
+
+    def _next_frame_score(self):
+        # returns (audio_level, gated, wake_score) for the next frame, or None if there's nothing to handle yet.
+        # wake_score is only set when the frame crossed the wake word threshold.
+        if self.wakeword_worker is None:
+            oww_audio = self.audio_buffer.read_frame(timeout=1)
+            if oww_audio is None:
+                return None
+            if self.audio_buffer.overruns != self.last_overruns:
+                self.last_overruns = self.audio_buffer.overruns
+                print(f"Audio buffer overrun: {self.audio_buffer.dropped_samples} samples dropped so far.")
+            audio_level = self.scorer.audio_level(oww_audio)
+            if not self.scorer.gate(audio_level, time.time()):
+                return audio_level, False, None
+            # Make the prediction
+            self.wake_assistant, score = self.scorer.detect(oww_audio)
+            return audio_level, True, score if self.wake_assistant is not None else None
+
+        # the worker is replaced when the wake word models are reloaded
+        worker = self.wakeword_worker
+        event = worker.next_event(timeout=1)
+        if event is None:
+            return None
+        event_type = event.get("event")
+        if event_type == "level":
+            self.last_audio_level = event["audio_level"]
+            return self.last_audio_level, event["gated"], None
+        if event_type == "detection":
+            # the worker has its own copy of the audio; find where the wake word ended in ours
+            lag_samples = int((time.time() - event["time"]) * self.oww_sample_rate)
+            self.wake_position = self.audio_buffer.write_position() - lag_samples
+            self.wake_assistant = event.get("assistant")
+            return self.last_audio_level, True, event["score"]
+        if event_type == "overrun":
+            print(f"Wake word worker audio overrun: {event['dropped_samples']} samples dropped so far.")
+        elif event_type == "ready":
+            print("Wake word worker ready.")
+        elif event_type == "exit" and self.is_running and worker is self.wakeword_worker:
+            print("Wake word worker exited unexpectedly. Restarting it...")
+            self.wakeword_worker.stop()
+            self._start_wakeword_worker()
+            self.wakeword_worker.resume()
+        return None
 
     def audio_consumer(self):
         current_time = time.time()
-        last_audio_level_emit_time = current_time
-        last_audio_level_over_threshold = current_time
+        last_noise_floor_time = current_time
+        if self.scorer is not None:
+            self.scorer.last_audio_level_over_threshold = current_time
+        self.last_audio_level = 0
         self._init_mic_stream()
         while self.is_running:
             try:
                 if self.is_awoken:
                     #print("Audio consumer paused")
-                    if self.mic_stream is not None:
-                        self.mic_stream.stop_stream()
+                    # the capture stream stays open; audio heard while paused is just dropped
+                    if self.wakeword_worker is not None:
+                        self.wakeword_worker.pause()
                     while self.is_running and self.is_awoken:
                         time.sleep(1)
-                    if self.mic_stream is not None:
-                        self.mic_stream.start_stream()
+                    self.audio_buffer.clear()
+                    if self.wakeword_worker is not None:
+                        self.wakeword_worker.resume()
                 #print("Audio consumer resumed")
                 self.handle_led_event("Running")
-                oww_audio = self.audio_queue.get()
-                audio_level = np.abs(oww_audio).mean()
-                if current_time - last_audio_level_emit_time >= 0.1:
-                    socketio.emit('processing_audio', {'status': 'ready'})
+                if current_time - last_noise_floor_time >= 1:
+                    last_noise_floor_time = current_time
+                    self.apply_noise_floor()
+                frame_score = self._next_frame_score()
+                if frame_score is None:
+                    continue
+                audio_level, gated, wake_score = frame_score
                 current_time = time.time()
-                # if audio level is below the threshold, skip processing, 
-                # but if the audio level was just above the threshold in the last 0.5 seconds, 
-                # process the audio as its the tail end of the audio
-                if audio_level < vad_threshold and current_time - last_audio_level_over_threshold > 0.75:
+                # the event bus only sends the latest audio level, so every frame can publish it
+                if not gated:
+                    event_bus.publish('processing_audio', {'status': 'ready'})
                     continue
-                if audio_level > vad_threshold:
-                    last_audio_level_over_threshold = current_time
                 if print_audio_level:
                     print(f"Audio level threshold ({audio_level}) triggered. Processing audio...")
-                # we don't want to send too many messages to the frontend. only send every audio level if its been 0.1 seconds
-                if current_time - last_audio_level_emit_time >= 0.1:
-                    socketio.emit('processing_audio', {'status': 'done', 'audio_level': audio_level})
-                    last_audio_level_emit_time = time.time()
-                # Make the prediction
-                prediction = self.handle.predict(oww_audio)
-                prediction_models = list(prediction.keys())
-                mdl = prediction_models[0]
-                score = float(prediction[mdl])
-                if score >= 0.5 and not self.is_request_processing:
-                    socketio.emit('awake', {'status': 'ready'})
-                    self.is_awoken = True
-                    print(f"Awoken with score {round(score, 3)}!")
-                    self.handle_led_event("Transcript")
-                    self.sound_effect.play(self.sound_effect.get_random_wake_sound())
-                    socketio.emit('listening_for_prompt', {'status': 'ready'})
-                    self.listener.listen()
-                    self.handle_led_event("StreamingStarted")
-                    socketio.emit('prompt_received', {'status': 'ready'})
-                    self.listener.sound_effect = self.sound_effect.play_loop("loading")
-                    self.listener.transcribe()
-                    prediction = self.predictSilence()
-                    if self.listener.transcript is None:
-                        self.sound_effect.play("error")
-                        self._init_mic_stream()
-                        continue
-                    self.process_transcript(self.listener.transcript)
+                event_bus.publish('processing_audio', {'status': 'done', 'audio_level': audio_level})
+                if wake_score is not None and not self.is_request_processing:
+                    self.on_wake_word(wake_score)
             except Exception as e:
                 print("Error processing audio in audio_consumer...")
                 self.something_went_wrong()
                 print(f"Error: {e}")
                 continue
 
+    def on_wake_word(self, score):
+        self.wait_for_components()
+        if self.wake_assistant is not None and self.wake_assistant != config["assistant"]:
+            # listening for every assistant: the wake word picks who answers
+            print(f"Wake word for {assistants[self.wake_assistant]['name']} heard.")
+            change_assistant({'assistant': self.wake_assistant})
+        event_bus.publish('awake', {'status': 'ready'})
+        self.is_awoken = True
+        if self.wakeword_worker is None:
+            self.wake_position = self.audio_buffer.tell()
+        print(f"Awoken with score {round(score, 3)}!")
+        self.handle_led_event("Transcript")
+        # get speech recognition ready while the wake sound plays
+        prepare_future = self.dispatcher.submit(self.listener.prepare)
+        self.sound_effect.play(self.sound_effect.get_random_wake_sound())
+        prepare_future.result()
+        event_bus.publish('listening_for_prompt', {'status': 'ready'})
+        # start the recording from just after the wake word (up to the pre-roll limit),
+        # so a command spoken over the wake sound isn't cut off
+        self.audio_buffer.seek(max(self.wake_position, self.audio_buffer.write_position() - self.listen_pre_roll_samples))
+        self.listener.listen()
+        self.handle_led_event("StreamingStarted")
+        event_bus.publish('prompt_received', {'status': 'ready'})
+        self.listener.sound_effect = self.sound_effect.play_loop("loading")
+        self.listener.transcribe()
+        self.predictSilence()
+        if self.listener.transcript is None:
+            self.sound_effect.play("error")
+            self._init_mic_stream()
+            return
+        self.process_transcript(self.listener.transcript)
+
     def process_audio(self):
         self.consumer_thread = threading.Thread(target=self.audio_consumer)
         self.is_awoken = True
         self.consumer_thread.start()
+        # raises (ending run()) if the LLM client, TTS or sound effects failed to initialize
+        self.wait_for_components()
         self.handle_led_event("VoiceStarted")
         if self.use_elevenlabs:
             self.sound_effect.play("ready")
@@ -302,50 +586,69 @@ class WakeWordDetector:
             print(f"LED event: {event}")
 
     def predictSilence(self):
-        # Calculate the number of samples for the given duration of silence
-        duration_seconds=2
-        num_samples = int(self.oww_sample_rate * duration_seconds)
-        silence_data = np.zeros(num_samples, dtype=np.int16)
+        prediction = None
         # Predict the silence data to initialize the model
         try:
-            prediction = self.handle.predict(silence_data)
+            if self.wakeword_worker is not None:
+                self.wakeword_worker.reset()
+            else:
+                prediction = self.scorer.reset()
         except Exception as e:
             print(f"Error: {e}")
             pass
         return prediction
 
+    def _open_mic_stream(self):
+        def audio_callback(in_data, frame_count, time_info, status):
+            self.audio_buffer.write(in_data)
+            # only learn from the room, not from our own speech and sound effects
+            if noise_floor is not None and not self.is_awoken:
+                noise_floor.update(in_data)
+            if self.wakeword_worker is not None:
+                self.wakeword_worker.write(in_data)
+            return (in_data, pyaudio.paContinue)
+
+        self.mic_stream = self.pa.open(
+            rate=self.oww_sample_rate,
+            channels=self.oww_channels,
+            format=pyaudio.paInt16,
+            input=True,
+            frames_per_buffer=self.oww_chunk_size,
+            stream_callback=audio_callback
+        )
+
     def _init_mic_stream(self):
         self.handle_led_event("Connected")
 
-        def audio_callback(in_data, frame_count, time_info, status):
-            audio = np.frombuffer(in_data, dtype=np.int16)
-            self.audio_queue.put(audio)
-            return (in_data, pyaudio.paContinue)
-        
         if self.pa is not None:
-            if self.mic_stream is not None:
-                self.mic_stream.stop_stream()
-                self.mic_stream.close()
-            self.mic_stream = self.pa.open(
-                rate=self.oww_sample_rate,
-                channels=self.oww_channels,
-                format=pyaudio.paInt16,
-                input=True,
-                frames_per_buffer=self.oww_chunk_size,
-                stream_callback=audio_callback
-            )
+            if self.mic_stream is None:
+                self._open_mic_stream()
+            elif not self.mic_stream.is_active():
+                self.mic_stream.start_stream()
+        # drop audio captured while the request was handled; nobody was reading it, so those overruns don't count
+        self.audio_buffer.clear()
+        self.last_overruns = self.audio_buffer.overruns
+        if self.wakeword_worker is not None:
+            self.wakeword_worker.resume()
         self.is_request_processing = False
         if (shairport_handler is not None and shairport_handler.shairport_active) \
             or (radio_player is not None and radio_player.running) and not self.is_awoken:
             self.is_awoken = True
-            socketio.emit('music_active', {'status': 'ready'})
+            event_bus.publish('music_active', {'status': 'ready'})
             print("Music active. Pausing chatbot vad...")
         else:
             self.is_awoken = False
-            socketio.emit('chatbot_ready', {'status': 'ready'})
+            event_bus.publish('chatbot_ready', {'status': 'ready'})
             print("Listening for '" + assistant["wake_word"] + "'...")
+        # the first time through, startup is over once the background components are built too
+        self.init_graph.on_done(startup_profiler.finish)
     
     def something_went_wrong(self):
+        if not self.components_ready:
+            # nothing to play the error with; process_audio stops the app if they failed
+            print("Something went wrong before the components were ready.")
+            self._init_mic_stream()
+            return
         if self.listener.sound_effect is not None:
             self.listener.sound_effect.stop_sound()
         if self.chat_gpt_service.sound_effect is not None:
@@ -407,12 +710,188 @@ class WakeWordDetector:
         seconds %= 60
         return days, hours, minutes, seconds
     
+    def build_intent_router(self):
+        router = IntentRouter()
+        handlers = {
+            "time": self.handle_time_intent,
+            "radio": self.handle_radio_intent,
+            "kids_radio": self.handle_kids_radio_intent,
+            "stop_radio": self.handle_stop_radio_intent,
+            "set_alarm": self.handle_set_alarm_intent,
+            "set_timer": self.handle_set_timer_intent,
+            "delete_alarms": self.handle_delete_alarms_intent,
+            "delete_timers": self.handle_delete_timers_intent,
+            "change_assistant": self.handle_change_assistant_intent,
+        }
+        guards = {
+            # "what time is it in Paris" is a question for the LLM
+            "time": lambda text: "in" not in text,
+        }
+        for name, phrases in DEFAULT_INTENTS:
+            router.register(name, phrases, handlers[name], guards.get(name), case_sensitive=name in CASE_SENSITIVE_INTENTS)
+        router.compile()
+        return router
+
+    def handle_time_intent(self, transcript):
+        append2log(f"You: {transcript} \n")
+        self.handle_led_event("VoiceStarted")
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        # get the current time in am/pm format without leading zeros
+        current_time = time.strftime('%I:%M %p').lstrip("0").replace("AM", "a.m.").replace("PM", "p.m.")
+        response = f"{current_time}"
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def unavailable(self, transcript, response):
+        # the component behind an intent failed to initialize at startup
+        append2log(f"You: {transcript} \n")
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def handle_radio_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if radio_player is None:
+            self.unavailable(transcript, "The radio isn't available.")
+            return
+        print("Starting radio...")
+        append2log(f"You: {transcript} \n")
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        radio_player.start(config["radio_stream_url"])
+        response = "Radio started."
+        append2log(f"{assistant_name}: {response} \n")
+
+    def handle_kids_radio_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if radio_player is None:
+            self.unavailable(transcript, "The radio isn't available.")
+            return
+        print("Starting kids radio...")
+        append2log(f"You: {transcript} \n")
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        radio_player.start(config["kids_radio_stream_url"])
+        response = "Kids radio started."
+        append2log(f"{assistant_name}: {response} \n")
+
+    def handle_stop_radio_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if radio_player is None:
+            self.unavailable(transcript, "The radio isn't available.")
+            return
+        print("Stopping radio...")
+        append2log(f"You: {transcript} \n")
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        radio_player.stop()
+        response = "Radio stopped."
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def handle_set_alarm_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if alarm_timer_service is None:
+            self.unavailable(transcript, "Alarms and timers aren't available.")
+            return
+        print("Setting an alarm...")
+        append2log(f"You: {transcript} \n")
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        # Extract time from transcript and set alarm
+        alarm_time = self.extract_time_from_transcript(transcript)
+        alarm_timer_service.add_alarm(alarm_time)
+        response = "Alarm set for " + alarm_time.strftime('%I:%M %p')
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def handle_set_timer_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if alarm_timer_service is None:
+            self.unavailable(transcript, "Alarms and timers aren't available.")
+            return
+        print("Setting a timer...")
+        append2log(f"You: {transcript} \n")
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        # Extract duration from transcript and set timer
+        duration = self.extract_duration_from_transcript(transcript)
+        alarm_timer_service.add_timer(duration)
+        days, hours, minutes, seconds = self.durationSecondsToMaxUnits(duration)
+        day = f"{days} day" + ("s" if days > 1 else "") + ", " if days else ""
+        hour = f"{hours} hour" + ("s" if hours > 1 else "") + ", " if hours else ""
+        minute = f"{minutes} minute" + ("s" if minutes > 1 else "") + ", " if minutes else ""
+        second = f"{seconds} second" + ("s" if seconds > 1 else "") + ", " if seconds else ""
+        response = "Timer set for " + f"{day}{hour}{minute}{second}"
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def handle_delete_alarms_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if alarm_timer_service is None:
+            self.unavailable(transcript, "Alarms and timers aren't available.")
+            return
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        alarm_timer_service.delete_all_jobs("alarm")
+        response = "All alarms and timers deleted"
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def handle_delete_timers_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        if alarm_timer_service is None:
+            self.unavailable(transcript, "Alarms and timers aren't available.")
+            return
+        self.sound_effect.play(self.sound_effect.get_random_filler_sound())
+        alarm_timer_service.delete_all_jobs("timer")
+        response = "All alarms and timers deleted"
+        append2log(f"{assistant_name}: {response} \n")
+        self.speech.speak(response)
+
+    def handle_change_assistant_intent(self, transcript):
+        self.handle_led_event("VoiceStarted")
+        print("Changing assistant...")
+        if "taurus" in transcript.lower():
+            print("Handling mispronunciation of Taurus for TARS...")
+            transcript = transcript.replace("Taurus", "taurus").replace("taurus", "Taurus (TARS)")
+        append2log(f"You: {transcript} \n")
+        # grab the assisant name from the transcript
+        new_assistant = next((assistant for assistant in assistants if assistants.get(assistant, {}).get('name', '').lower() in transcript.lower()), None)
+        new_assistant_name = assistants.get(new_assistant, {}).get('name', '')
+        if new_assistant and new_assistant_name != assistant_name:
+            print(f"Switching to {new_assistant_name}...")
+            change_assistant({'assistant': new_assistant_name.lower()})
+        elif new_assistant_name == assistant_name:
+            response = f"I'm already {assistant_name}."
+            print(response)
+            append2log(f"{assistant_name}: {response} \n")
+            self.speech.speak(response)
+        else:
+            response = "Assistant not found."
+            print(response)
+            append2log(f"{assistant_name}: {response} \n")
+            self.speech.speak(response)
+
+    def answer_from_cache(self, transcript):
+        cached = response_cache.get(config["assistant"], transcript)
+        if cached is None:
+            return False
+        print("Answering from the response cache...")
+        append2log(f"You: {transcript} \n")
+        self.handle_led_event("VoiceStarted")
+        print(f"{assistant_name}: {cached['text']}")
+        append2log(f"{assistant_name}: {cached['text']} \n")
+        if cached["audio"] is not None:
+            for audio in cached["audio"]:
+                self.speech.play_audio(audio)
+        else:
+            self.speech.speak(cached["text"])
+        # keep the conversation history as if the LLM had answered
+        self.chat_gpt_service.add_to_history(transcript, cached["text"])
+        return True
+
     def process_transcript(self, transcript, image=None, image_name=''):
         if self.is_request_processing:
             print("A request is already being processed. Please wait.")
             return 
+        self.wait_for_components()
         self.handle_led_event("Processing")
         self.is_request_processing = True
+        reload_lock.acquire()
         try:
             start_time = time.time()
             print(f"You: {transcript}")
@@ -430,282 +909,67 @@ class WakeWordDetector:
                 append2log(f"{assistant_name}: {short_response} \n")
                 return
             
-            time_phrases = [
-                "what time is it",
-                "what is the time",
-                "what is the current time",
-                "what's the time",
-                "what's the current time",
-                "do you have the time",
-                "do you have the current time",
-                "do you know the time",
-                "do you know the current time",
-                "tell me the time",
-                "tell me the current time",
-                "tell me what time it is",
-            ]
-
-            if any(phrase in transcript for phrase in time_phrases) and "in" not in transcript and not image:
-                append2log(f"You: {transcript} \n")
-                self.handle_led_event("VoiceStarted")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                # get the current time in am/pm format without leading zeros
-                current_time = time.strftime('%I:%M %p').lstrip("0").replace("AM", "a.m.").replace("PM", "p.m.")
-                response = f"{current_time}"
-                append2log(f"{assistant_name}: {response} \n")
-                self.speech.speak(response)
+            if not image and self.intent_router.route(transcript):
                 return
 
-            radio_phrases = [
-                "play radio",
-                "play music",
-                "play some music",
-                "play some radio",
-                "play some tunes",
-                "play some songs",
-                "play the radio",
-                "play the music",
-                "play the tunes",
-                "play the songs",
-            ]
-
-            if any(phrase in transcript.lower() for phrase in radio_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                print("Starting radio...")
-                append2log(f"You: {transcript} \n")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                radio_player.start(config["radio_stream_url"])
-                response = "Radio started."
-                append2log(f"{assistant_name}: {response} \n")
-                return
-            
-            radio_phrases = [
-                "play kids radio",
-                "play kids music",
-                "play kids songs",
-                "play kids tunes",
-                "play kid radio",
-                "play kid music",
-                "play kid songs",
-                "play kid tunes",
-                "play the kids radio",
-                "play the kids music",
-                "play the kids songs",
-                "play the kids tunes",
-                "play the kid radio",
-                "play the kid music",
-                "play the kid songs",
-                "play the kid tunes",
-                "play children's radio",
-                "play children's music",
-                "play children's songs",
-                "play children's tunes",
-                "play the children's radio",
-                "play the children's music",
-                "play the children's songs",
-                "play the children's tunes",
-            ]
-
-            if any(phrase in transcript.lower() for phrase in radio_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                print("Starting kids radio...")
-                append2log(f"You: {transcript} \n")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                radio_player.start(config["kids_radio_stream_url"])
-                response = "Kids radio started."
-                append2log(f"{assistant_name}: {response} \n")
-                return
-
-            radio_phrases = [
-                "stop playing",
-                "stop the radio",
-                "stop the music",
-                "stop the tunes",
-                "stop the songs",
-                "stop music",
-                "stop radio",
-                "stop tunes",
-                "stop songs",
-                "stop playing music",
-                "stop playing radio",
-                "stop playing tunes",
-                "stop playing songs",
-            ]
-
-            if any(phrase in transcript.lower() for phrase in radio_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                print("Stopping radio...")
-                append2log(f"You: {transcript} \n")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                radio_player.stop()
-                response = "Radio stopped."
-                append2log(f"{assistant_name}: {response} \n")
-                self.speech.speak(response)
-                return
-
-            alarm_phrases = [
-                "set an alarm",
-                "set a alarm",
-                "set alarm",
-                "set the alarm",
-                "wake me up",
-            ]
-
-            if any(phrase in transcript.lower() for phrase in alarm_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                print("Setting an alarm...")
-                append2log(f"You: {transcript} \n")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                # Extract time from transcript and set alarm
-                alarm_time = self.extract_time_from_transcript(transcript)
-                alarm_timer_service.add_alarm(alarm_time)
-                response = "Alarm set for " + alarm_time.strftime('%I:%M %p')
-                append2log(f"{assistant_name}: {response} \n")
-                self.speech.speak(response)
-                return
-            
-            timer_phrases = [
-                "set a timer",
-                "set timer",
-                "set the timer",
-            ]
-
-            if any(phrase in transcript.lower() for phrase in timer_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                print("Setting a timer...")
-                append2log(f"You: {transcript} \n")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                # Extract duration from transcript and set timer
-                duration = self.extract_duration_from_transcript(transcript)
-                alarm_timer_service.add_timer(duration)
-                days, hours, minutes, seconds = self.durationSecondsToMaxUnits(duration)
-                day = f"{days} day" + ("s" if days > 1 else "") + ", " if days else ""
-                hour = f"{hours} hour" + ("s" if hours > 1 else "") + ", " if hours else ""
-                minute = f"{minutes} minute" + ("s" if minutes > 1 else "") + ", " if minutes else ""
-                second = f"{seconds} second" + ("s" if seconds > 1 else "") + ", " if seconds else ""
-                response = "Timer set for " + f"{day}{hour}{minute}{second}"
-                append2log(f"{assistant_name}: {response} \n")
-                self.speech.speak(response)
-                return
-
-            delete_phrases = [
-            "delete all alarm",
-            "reset all alarm",
-            "turn off all alarm",
-            "cancel all alarm",
-            "clear all alarm",
-            "forget all alarm",
-            "delete alarm",
-            "reset alarm",
-            "turn off alarm",
-            "cancel alarm",
-            "clear alarm",
-            "forget alarm",
-            ]
-            if any(phrase in transcript.lower() for phrase in delete_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                alarm_timer_service.delete_all_jobs("alarm")
-                response = "All alarms and timers deleted"
-                append2log(f"{assistant_name}: {response} \n")
-                self.speech.speak(response)
-                return
-            
-            delete_phrases = [
-            "delete all timer",
-            "reset all timer",
-            "turn off all timer",
-            "cancel all timer",
-            "clear all timer",
-            "forget all timer",
-            "delete timer",
-            "reset timer",
-            "turn off timer",
-            "cancel timer",
-            "clear timer",
-            "forget timer",
-            ]
-            if any(phrase in transcript.lower() for phrase in delete_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                self.sound_effect.play(self.sound_effect.get_random_filler_sound())
-                alarm_timer_service.delete_all_jobs("timer")
-                response = "All alarms and timers deleted"
-                append2log(f"{assistant_name}: {response} \n")
-                self.speech.speak(response)
-                return
-            
-            change_assistant_phrases = [
-                "change assistant",
-                "switch assistant",
-                "change the assistant",
-                "switch the assistant",
-                "change voice assistant",
-                "switch voice assistant",
-                "change the voice assistant",
-                "switch the voice assistant",
-                "change the voice",
-                "switch the voice",
-                "change voice",
-                "switch voice",
-                "change your voice",
-                "switch your voice",
-                "change your name",
-                "switch your name",
-            ]
-
-            if any(phrase in transcript.lower() for phrase in change_assistant_phrases) and not image:
-                self.handle_led_event("VoiceStarted")
-                print("Changing assistant...")
-                if "taurus" in transcript.lower():
-                    print("Handling mispronunciation of Taurus for TARS...")
-                    transcript = transcript.replace("Taurus", "taurus").replace("taurus", "Taurus (TARS)")
-                append2log(f"You: {transcript} \n")
-                # grab the assisant name from the transcript
-                new_assistant = next((assistant for assistant in assistants if assistants.get(assistant, {}).get('name', '').lower() in transcript.lower()), None)
-                new_assistant_name = assistants.get(new_assistant, {}).get('name', '')
-                if new_assistant and new_assistant_name != assistant_name:
-                    print(f"Switching to {new_assistant_name}...")
-                    change_assistant({'assistant': new_assistant_name.lower()})
-                elif new_assistant_name == assistant_name:
-                    response = f"I'm already {assistant_name}."
-                    print(response)
-                    append2log(f"{assistant_name}: {response} \n")
-                    self.speech.speak(response)
-                else:
-                    response = "Assistant not found."
-                    print(response)
-                    append2log(f"{assistant_name}: {response} \n")
-                    self.speech.speak(response)
+            # the system prompt is always there; anything more is a recent exchange a follow-up could refer to
+            has_context = len(self.chat_gpt_service.history) > 1
+            use_response_cache = response_cache is not None and not image and response_cache.is_cacheable(transcript, has_context)
+            if use_response_cache and self.answer_from_cache(transcript):
+                print(f"Total Time: {time.time() - start_time} seconds")
                 return
 
-            self.sound_effect.play(self.sound_effect.get_random_filler_sound())
             print("Sending to chat GPT...")
             append2log(f"You: {transcript}", noNewLine=True)
+            # send the request while the filler sound plays instead of after it
+            response_future = self.dispatcher.submit(self.chat_gpt_service.send_to_chat_gpt, transcript, image, image_name)
+            self.sound_effect.play(self.sound_effect.get_random_filler_sound())
             self.chat_gpt_service.sound_effect = self.sound_effect.play_loop("loading")
             self.speech.sound_effect = self.chat_gpt_service.sound_effect
 
-            text_iterator = self.chat_gpt_service.send_to_chat_gpt(transcript, image, image_name)
+            text_iterator = response_future.result()
             if text_iterator is None:
                 append2log(f"{assistant_name}: Something went wrong.")
                 self.something_went_wrong()
                 return
 
-            socketio.emit('chat_response_ready', {'status': 'ready'})
+            event_bus.publish('chat_response_ready', {'status': 'ready'})
             self.handle_led_event("VoiceStarted")
             if isinstance(text_iterator, str):
+                # an error message, not an answer worth keeping
+                use_response_cache = False
                 text_iterator = [text_iterator]
             elif isinstance(text_iterator, Iterable):
                 text_iterator = text_iterator
             else:
                 raise ValueError("Invalid input type: text_input must be a string or an iterable")
+            response_text = []
+            response_audio = [] if use_response_cache else None
+            # sentences are synthesized ahead while earlier ones play
+            speech_pipeline = self.speech.start_pipeline(response_audio)
             for text in text_iterator:
+                if not self.speech.is_running:
+                    break
                 if text.strip():
-                    self.speech.speak(text)
+                    response_text.append(text.strip())
+                    speech_pipeline.add(text)
+            spoken = speech_pipeline.finish()
             end_time = time.time()
+            if use_response_cache and response_text and spoken and self.speech.is_running:
+                response_cache.put(config["assistant"], transcript, " ".join(response_text), response_audio)
 
             print(f"Total Time: {end_time - start_time} seconds")
         finally:
-            self._init_mic_stream()
+            try:
+                # the loading loop only stops when speech starts; if no sentence played (all failed or
+                # were cancelled) it would go on forever
+                if self.chat_gpt_service.sound_effect is not None:
+                    self.chat_gpt_service.sound_effect.stop_sound()
+                    self.chat_gpt_service.sound_effect = None
+                    self.speech.sound_effect = None
+                self._init_mic_stream()
+            finally:
+                reload_lock.release()
 
     def run(self):
         try:            
@@ -728,6 +992,12 @@ class WakeWordDetector:
             self.mic_stream.close()
         if self.pa is not None:
             self.pa.terminate()
+        if self.wakeword_worker is not None:
+            self.wakeword_worker.stop()
+        if noise_floor is not None:
+            noise_floor.save()
+        self.wakeword_worker = None
+        self.dispatcher.shutdown(wait=False)
         self.mic_stream = None
         self.pa = None
         self.speech = None
@@ -735,7 +1005,8 @@ class WakeWordDetector:
         self.chat_gpt_service = None
         self.listener = None
         self.handle = None
-        self.audio_queue = None
+        self.scorer = None
+        self.audio_buffer = None
 
 @app.template_filter('find_url')
 def find_url_filter(text):
@@ -745,27 +1016,8 @@ def find_url_filter(text):
     return url if url else None
 
 # Function to get chat logs for a specific date
-def get_chat_log_for_date(dateStr):
-    chatlog_filename = getChatFilename(dateStr)
-    filename = chatlog_filename.split("-")[0] + f"-{dateStr}.txt"
-    print(f"Getting chat log for {filename}...")
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            # read a line until you reach the end or You: or assistant_name:
-            chatlog = []
-            for line in f:
-                if line.startswith("You: ") or line.startswith(f"{assistant_name}: "):
-                    chatlog.append(line)
-                else:
-                    if chatlog:
-                        chatlog[-1] += line
-                    else:
-                        chatlog.append(line)
-    except FileNotFoundError:
-        chatlog = []
-
-    chatlog = [{"message": message.strip()} for message in chatlog]
-    return chatlog
+def get_chat_log_for_date(dateStr, after_id=None, before_id=None, limit=None):
+    return chat_history.get_messages(config['assistant'], dateStr, after_id, before_id, limit)
 
 # @app.route('/set_alarm', methods=['POST'])
 # def set_alarm():
@@ -786,28 +1038,61 @@ def get_chat_log_for_date(dateStr):
 #     alarm_timer_service.delete_all_jobs()
 #     return jsonify({'status': 'all jobs deleted'})
 
+@app.route('/event_bus_stats')
+def event_bus_stats():
+    return jsonify(event_bus.stats())
+
+@app.route('/chat_log_stats')
+def chat_log_stats():
+    return jsonify(chat_log_writer.stats())
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    if alarm_timer_service is None:
+        return jsonify([])
+    return jsonify(alarm_timer_service.list_jobs(request.args.get('type')))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if alarm_timer_service is not None and alarm_timer_service.cancel_job(job_id):
+        return jsonify({"status": "cancelled"}), 200
+    return jsonify({"status": "not found"}), 404
+
 @app.route('/chatlog/<date>', methods=['GET'])
 def chatlog(date):
-    chatlog = get_chat_log_for_date(date)
+    # ?before_id=&limit= pages back through the day, ?after_id= returns only newer messages
+    chatlog = get_chat_log_for_date(date,
+                                    after_id=request.args.get('after_id', type=int),
+                                    before_id=request.args.get('before_id', type=int),
+                                    limit=request.args.get('limit', type=int))
     return jsonify(chatlog)
 
+@app.route('/chatlog/search', methods=['GET'])
+def search_chatlog():
+    results = chat_history.search(request.args.get('q', ''),
+                                  assistant=request.args.get('assistant'),
+                                  limit=request.args.get('limit', 50, type=int),
+                                  offset=request.args.get('offset', 0, type=int))
+    return jsonify(results)
+
 @app.route('/')
 def index():
     today = str(date.today())
-    chatlog = get_chat_log_for_date(today)
+    chatlog = get_chat_log_for_date(today, limit=chat_page_size)
     return render_template('index.html', vad_threshold=vad_threshold, 
                            max_threshold=max_threshold, 
                            assistants=assistants, 
                            assistant_dict=assistant, 
                            images_disabled=config["use_groq"], 
                            chatlog=json.dumps(chatlog), 
+                           chat_page_size=chat_page_size,
                            radio_playing=(radio_player is not None and radio_player.running)
                            )
 
 @socketio.on("file_chunk")
 def handle_file_chunk(data):
     use_imgur = config["use_imgur"]
-    socketio.emit('prompt_received', {'status': 'ready'})
+    event_bus.publish('prompt_received', {'status': 'ready'})
     detector = app.config['detector']
     # Extracting the chunk data
     file_id = data.get("fileId")
@@ -866,30 +1151,27 @@ def uploaded_file(filename):
 @app.route('/history')
 def history():
     today = str(date.today())
-    chatlog = get_chat_log_for_date(today)
-    return render_template('history.html', assistant_dict=assistant, chatlog=json.dumps(chatlog))
+    chatlog = get_chat_log_for_date(today, limit=chat_page_size)
+    return render_template('history.html', assistant_dict=assistant, chatlog=json.dumps(chatlog), chat_page_size=chat_page_size)
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
-    global config
     if request.method == 'POST':
-        config['openai_model'] = request.form['openai_model']
-        config['groq_model'] = request.form['groq_model']
-        config['use_groq'] = 'use_groq' in request.form
-        config['radio_stream_url'] = request.form['radio_stream_url']
-        config['kids_radio_stream_url'] = request.form['kids_radio_stream_url']
-        config['elevenlabs_key'] = request.form['elevenlabs_key']
-        config['use_elevenlabs'] = 'use_elevenlabs' in request.form
-        config['use_gtts'] = 'use_gtts' in request.form
-        config['imgur_client_id'] = request.form['imgur_client_id']
-        config['imgur_client_secret'] = request.form['imgur_client_secret']
-        config['max_threshold'] = int(request.form['max_threshold'])
-        config['led_brightness'] = int(request.form['led_brightness'])
-        # Save the updated config to the file
-        with open('config.json', 'w') as f:
-            json.dump(config, f, indent=4)
-        restart_app()
-        return jsonify({"status": "ok"}), 200
+        new_config = dict(config)
+        new_config['openai_model'] = request.form['openai_model']
+        new_config['groq_model'] = request.form['groq_model']
+        new_config['use_groq'] = 'use_groq' in request.form
+        new_config['radio_stream_url'] = request.form['radio_stream_url']
+        new_config['kids_radio_stream_url'] = request.form['kids_radio_stream_url']
+        new_config['elevenlabs_key'] = request.form['elevenlabs_key']
+        new_config['use_elevenlabs'] = 'use_elevenlabs' in request.form
+        new_config['use_gtts'] = 'use_gtts' in request.form
+        new_config['imgur_client_id'] = request.form['imgur_client_id']
+        new_config['imgur_client_secret'] = request.form['imgur_client_secret']
+        new_config['max_threshold'] = int(request.form['max_threshold'])
+        new_config['led_brightness'] = int(request.form['led_brightness'])
+        changed = apply_config(new_config)
+        return jsonify({"status": "ok", "changed": changed}), 200
     return render_template('settings.html', config=config)
 
 @app.route('/play_radio', methods=['POST'])
@@ -916,45 +1198,83 @@ def stop_radio():
             return jsonify({"status": "done"}), 200
     return jsonify({"status": "error"}), 500
 
+@app.route('/http_stats')
+def http_stats():
+    return jsonify(get_http_pool().stats())
+
+@app.route('/tts_cache_stats')
+def tts_cache_stats():
+    tts_cache = get_tts_cache(config)
+    return jsonify(tts_cache.stats() if tts_cache is not None else {})
+
 @socketio.on('change_vad_threshold')
 def change_vad_threshold(data):
-    global vad_threshold, config
+    global vad_threshold
     new_threshold = int(data.get('vad_threshold'))
     if new_threshold:
         vad_threshold = new_threshold
-        with open(config_file, 'r+') as f:
-            config = json.load(f)
-            config['vad_threshold'] = new_threshold
-            f.seek(0)
-            json.dump(config, f, indent=4)
-            f.truncate()
+        if detector is not None:
+            detector.set_vad_threshold(new_threshold)
+        config['vad_threshold'] = new_threshold
+        save_config()
         print(f"VAD threshold changed to {new_threshold}.")
-        socketio.emit('vad_threshold_changed', {'vad_threshold': new_threshold})
-    return socketio.emit('vad_threshold_changed', {'vad_threshold': None})
+        event_bus.publish('vad_threshold_changed', {'vad_threshold': new_threshold})
+    # through the bus as well, so it can't overtake the new value
+    event_bus.publish('vad_threshold_changed', {'vad_threshold': None})
 
 @socketio.on('change_assistant')
 def change_assistant(data):
-    global config, assistant_name, assistant_acronym, assistant, chatlog_filename
     new_assistant = data.get('assistant')
     if new_assistant and new_assistant in assistants:
-        with open(config_file, 'r+') as f:
-            config = json.load(f)
-            old_assistant = config['assistant']
-            config['assistant'] = new_assistant
-            f.seek(0)
-            json.dump(config, f, indent=4)
-            f.truncate()
+        old_assistant = config['assistant']
+        apply_config(dict(config, assistant=new_assistant))
         print(f"Assistant changed from {old_assistant} to {new_assistant}.")
-        config["old_assistant"] = old_assistant
-        config["assistant_dict"] = assistants[new_assistant]
+        event_bus.publish('assistant_changed', {'assistant': new_assistant})
+        return
+    return socketio.emit('assistant_changed', {'assistant': None})
+
+def save_config():
+    with open(config_file, 'w') as f:
+        json.dump({key: value for key, value in config.items() if key not in RUNTIME_KEYS}, f, indent=4)
+
+def apply_config(new_config):
+    """
+    Saves new settings and applies them to the running app, rebuilding only the components
+    whose settings changed. Falls back to restart_app() for settings that can't be applied
+    live. Waits for a request in progress to finish first. Returns the names of the changed settings.
+    """
+    global assistant, assistant_name, assistant_acronym, vad_threshold, print_audio_level, max_threshold, chat_page_size
+    with reload_lock:
+        changed = changed_settings(config, new_config)
+        if not changed:
+            return changed
+        components, restart_required = plan_reload(changed)
+        if "assistant" in changed:
+            config["old_assistant"] = config["assistant"]
+        config.update({key: value for key, value in new_config.items() if key not in RUNTIME_KEYS})
+        save_config()
         assistant = assistants[config["assistant"]]
+        config["assistant_dict"] = assistant
         assistant_name = assistant["name"]
         assistant_acronym = assistant["acronym"]
-        chatlog_filename = chatlog_filename = getChatFilename(str(date.today()))
-        socketio.emit('assistant_changed', {'assistant': new_assistant})
-        restart_app()
-        return
-    return socketio.emit('assistant_changed', {'assistant': None})
+        vad_threshold = config["vad_threshold"]
+        print_audio_level = config["print_audio_level"]
+        max_threshold = config["max_threshold"]
+        chat_page_size = config.get("chat_page_size", 50)
+        print(f"Settings changed: {', '.join(changed)}")
+        if not restart_required and detector is not None:
+            if "vad_threshold" in changed:
+                detector.set_vad_threshold(vad_threshold)
+            if "led" in components:
+                components.remove("led")
+                if led_service is not None:
+                    led_service.set_brightness(min(config["led_brightness"], 31))
+            if components:
+                detector.reload(components)
+            return changed
+    # outside the lock: restarting joins the audio consumer, which may be waiting for it to start a request
+    restart_app()
+    return changed
 
 def run_flask_app():
     socketio.run(app, debug=False, use_reloader=False, allow_unsafe_werkzeug=True, host="0.0.0.0")
@@ -974,12 +1294,21 @@ def restart_app():
 def runApp():
     global detector, shairport_handler, loading_sound, radio_player, alarm_timer_service
     while not is_exiting:
-        loading_sound = SoundEffectService(config).play_loop("loading")
-        detector = WakeWordDetector()
-        radio_player = RadioPlayer(detector)
-        alarm_timer_service = AlarmTimerService()
+        with startup_profiler.phase("loading sound"):
+            loading_sound = SoundEffectService(config).play_loop("loading")
+        init_graph = InitGraph(max_workers=3, profiler=startup_profiler)
+        init_graph.add("detector", WakeWordDetector)
+        init_graph.add("alarms and timers", AlarmTimerService)
+        init_graph.add("radio", RadioPlayer, depends_on=("detector",))
         if is_rpi and config["use_shairport-sync"]:
-            shairport_handler = ShairportSyncHandler(detector, radio_player)
+            init_graph.add("shairport", ShairportSyncHandler, depends_on=("detector", "radio"))
+        init_graph.start()
+        # the app can run without the others (their intents say so), but not without the detector
+        detector = init_graph.result("detector")
+        components = init_graph.wait()
+        radio_player = components["radio"]
+        alarm_timer_service = components["alarms and timers"]
+        shairport_handler = components.get("shairport")
         app.config['detector'] = detector  # Attach detector to the Flask app config    
         detector.run()
         if not detector.restart_app:
@@ -1016,19 +1345,23 @@ def signal_handler(sig, frame):
         SoundEffectService(config).play("goodbye")
     else:
         TextToSpeechService(config).speak("Goodbye!")
+    chat_log_writer.close()
     sys.exit(0)
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 def check_internet_connection(url='http://www.google.com/', timeout=5):
     try:
-        response = requests.get(url, timeout=timeout)
+        # HEAD, since only reaching the server matters
+        response = get_http_pool().session.head(url, timeout=timeout)
         return True
     except requests.ConnectionError:
         return False
     
 if __name__ == "__main__":
-    if not check_internet_connection():
+    with startup_profiler.phase("internet check"):
+        is_connected = check_internet_connection()
+    if not is_connected:
         print("No internet connection. Please check your connection and try again.")
         config["use_elevenlabs"] = False
         config["use_gtts"] = False
@@ -1038,8 +1371,18 @@ if __name__ == "__main__":
     else:    
         if is_rpi:
             led_service.handle_event("Connected")
+
+        if config.get("http_warm_up", True):
+            warm_up_urls = ["https://api.groq.com/openai/v1/models" if config["use_groq"] else "https://api.openai.com/v1/models"]
+            if config["use_elevenlabs"]:
+                warm_up_urls.append("https://api.elevenlabs.io/v1/models")
+            get_http_pool().warm_up(["https://api.imgur.com/3/credits"] if config["use_imgur"] else [], warm_up_urls)
     
         if config["use_frontend"]:
             print("Starting Flask frontend...")
-            socketio.start_background_task(run_flask_app)
-        runApp()
+            with startup_profiler.phase("Flask start"):
+                socketio.start_background_task(run_flask_app)
+        try:
+            runApp()
+        finally:
+            chat_log_writer.close()
@@ -10,7 +10,6 @@ added_files = [
     ('oww_models', 'oww_models'),
     ('config.json.example', '.'), 
     ('assistants.json.example', '.'),
-    ('scheduled_task.xml', ','),
     ('readme.md', '.')
 ]
 hiddenimports = ['engineio.async_drivers.threading']
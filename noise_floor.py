@@ -0,0 +1,68 @@
+import collections
+import json
+import time
+import numpy as np
+
+class NoiseFloorEstimator:
+    """
+    Tracks the room's background noise from the audio the capture stream already reads.
+
+    Each frame's mean absolute level (what the wake word VAD gate uses) and RMS energy
+    (what speech_recognition's energy_threshold uses) go into a rolling window; the
+    estimate is a low percentile of that window, so speech and sound effects don't
+    drag it up. The estimate is saved to disk so a restart can use it straight away
+    instead of calibrating for a second.
+    """
+
+    def __init__(self, state_file, window_seconds=30, frame_seconds=0.08, percentile=20, save_interval=60):
+        self.state_file = state_file
+        self.percentile = percentile
+        self.save_interval = save_interval
+        window_frames = max(1, int(window_seconds / frame_seconds))
+        self.levels = collections.deque(maxlen=window_frames)
+        self.energies = collections.deque(maxlen=window_frames)
+        # recompute about once a second, not on every frame
+        self.update_every = max(1, int(1 / frame_seconds))
+        self.frames_since_update = 0
+        self.level = None
+        self.rms = None
+        self.last_save_time = time.time()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+            self.level = state["level"]
+            self.rms = state["rms"]
+            print(f"Loaded noise floor: level {round(self.level)}, rms {round(self.rms)}")
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        if self.level is None:
+            return
+        try:
+            with open(self.state_file, "w") as f:
+                json.dump({"level": self.level, "rms": self.rms, "updated": time.time()}, f)
+        except OSError as e:
+            print(f"Failed to save noise floor: {e}")
+        self.last_save_time = time.time()
+
+    def update(self, in_data):
+        samples = np.frombuffer(in_data, dtype=np.int16).astype(np.float32)
+        if not len(samples):
+            return
+        self.levels.append(float(np.abs(samples).mean()))
+        self.energies.append(float(np.sqrt(np.mean(samples * samples))))
+        self.frames_since_update += 1
+        if self.frames_since_update < self.update_every:
+            return
+        self.frames_since_update = 0
+        self.level = float(np.percentile(self.levels, self.percentile))
+        self.rms = float(np.percentile(self.energies, self.percentile))
+
+    def save_if_due(self):
+        # called from the consumer thread, never from the audio callback
+        if time.time() - self.last_save_time >= self.save_interval:
+            self.save()
@@ -0,0 +1,108 @@
+import queue
+import threading
+
+class Utterance:
+    def __init__(self, text, voice_index, filename):
+        self.text = text
+        self.voice_index = voice_index
+        self.filename = filename
+        self.cancelled = False
+        self.done = threading.Event()
+        self.error = None
+
+class OfflineSpeechWorker:
+    """
+    Owns one pyttsx3 engine on a thread of its own and renders queued utterances to wav files with it.
+
+    pyttsx3.init() and listing the voices only happen once; the voice is switched per
+    utterance only when it changes. cancel() drops everything queued and stops the
+    utterance being rendered at the next word.
+    """
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.current = None
+        self.engine = None
+        self.voices = []
+        self.voice_index = None
+        self.thread = threading.Thread(target=self._run, name="pyttsx3", daemon=True)
+        self.thread.start()
+
+    def save_to_file(self, text, filename, voice_index=0):
+        """Renders text to a wav file and waits for it."""
+        return self._submit(Utterance(text, voice_index, filename))
+
+    def _submit(self, utterance):
+        self.requests.put(utterance)
+        utterance.done.wait()
+        if utterance.error is not None:
+            raise utterance.error
+        return not utterance.cancelled
+
+    def cancel(self):
+        with self.lock:
+            while True:
+                try:
+                    utterance = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if utterance is not None:
+                    utterance.cancelled = True
+                    utterance.done.set()
+            if self.current is not None:
+                self.current.cancelled = True
+
+    def _on_word(self, name, location, length):
+        # runs on the engine's thread, the only place engine.stop() is safe to call
+        if self.current is not None and self.current.cancelled:
+            self.engine.stop()
+
+    def _set_voice(self, voice_index):
+        if voice_index == self.voice_index or not self.voices:
+            return
+        self.engine.setProperty('voice', self.voices[min(voice_index, len(self.voices) - 1)].id)
+        self.voice_index = voice_index
+
+    def _run(self):
+        init_error = None
+        try:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            self.voices = self.engine.getProperty('voices')
+            self.engine.connect('started-word', self._on_word)
+        except Exception as e:
+            print(f"Failed to start pyttsx3: {e}")
+            init_error = e
+        while True:
+            utterance = self.requests.get()
+            if utterance is None:
+                break
+            if init_error is not None:
+                utterance.error = init_error
+                utterance.done.set()
+                continue
+            with self.lock:
+                if utterance.cancelled:
+                    utterance.done.set()
+                    continue
+                self.current = utterance
+            try:
+                self._set_voice(utterance.voice_index)
+                self.engine.save_to_file(utterance.text, utterance.filename)
+                self.engine.runAndWait()
+            except Exception as e:
+                utterance.error = e
+            with self.lock:
+                self.current = None
+            utterance.done.set()
+
+offline_speech_worker = None
+offline_speech_worker_lock = threading.Lock()
+
+def get_offline_speech_worker():
+    global offline_speech_worker
+    with offline_speech_worker_lock:
+        if offline_speech_worker is None:
+            offline_speech_worker = OfflineSpeechWorker()
+        return offline_speech_worker
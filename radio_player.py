@@ -1,11 +1,11 @@
-import vlc
 import threading
 import time
 
 class RadioPlayer:
     def __init__(self, wakeword_detector):
         self.wakeword_detector = wakeword_detector
-        self.player = vlc.MediaPlayer()
+        # VLC is loaded the first time the radio is played
+        self.player = None
         self.thread = None
         self.running = False
         self.stream_url = None
@@ -24,6 +24,9 @@ class RadioPlayer:
             self.wakeword_detector.is_awoken = True
             self.blink_led_thread = threading.Thread(target=self.blink_led)
             self.blink_led_thread.start()
+            import vlc
+            if self.player is None:
+                self.player = vlc.MediaPlayer()
             self.player.set_media(vlc.Media(stream_url))
             self.thread = threading.Thread(target=self._play)
             self.thread.start()
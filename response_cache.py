@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# answers to these change from minute to minute, so they always go to the LLM
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"\b(time|today|tonight|tomorrow|yesterday|now|current|currently|latest|recent|"
+    r"weather|temperature|forecast|rain|snow|news|date|day|week|month|year|score|alarm|timer)\b"
+)
+# people ask these expecting a different answer each time
+VARIED_PATTERN = re.compile(r"\b(joke|jokes|story|riddle|random|another|again|different|new)\b")
+# these lean on the previous answer ("why?", "tell me more", "and the second one?"), so mid-conversation
+# the same words can mean something else each time
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(and|but|so|or|what about|how about)\b|"
+    r"\b(it|its|it's|that|this|these|those|they|them|their|he|him|his|she|her|one|ones|why|more|else|"
+    r"also|too|then|instead|same|other|previous|last|first|second|third|example|explain|elaborate|continue)\b"
+)
+
+class ResponseCache:
+    """
+    On-disk cache of LLM answers and their synthesized speech, keyed on assistant + normalized transcript.
+
+    The key has no conversation context, so callers skip the cache for follow-up
+    questions while the conversation has recent turns (see is_cacheable).
+
+    Entries expire after ttl_seconds and the least recently used ones are evicted to
+    stay within max_entries / max_bytes. Audio is kept as one file per spoken sentence.
+    """
+
+    def __init__(self, cache_dir, ttl_seconds=7 * 24 * 3600, max_entries=200, max_bytes=50 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def normalize(self, transcript):
+        text = re.sub(r"[^\w\s']", " ", transcript.lower())
+        return " ".join(text.split())
+
+    def is_cacheable(self, transcript, has_context=False):
+        # has_context: the conversation has recent turns a follow-up question could refer to
+        text = self.normalize(transcript)
+        if has_context and (len(text.split()) <= 2 or FOLLOW_UP_PATTERN.search(text)):
+            return False
+        return bool(text) and not TIME_SENSITIVE_PATTERN.search(text) and not VARIED_PATTERN.search(text)
+
+    def key(self, assistant, transcript):
+        return hashlib.sha1(f"{assistant}\n{self.normalize(transcript)}".encode("utf-8")).hexdigest()
+
+    def get(self, assistant, transcript):
+        """Returns {"text": str, "audio": [(format, bytes), ...] or None} or None on a miss."""
+        key = self.key(assistant, transcript)
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is not None and time.time() - entry["created"] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            audio = None
+            if entry["audio"] is not None:
+                try:
+                    audio = []
+                    for filename in entry["audio"]:
+                        with open(os.path.join(self.cache_dir, filename), "rb") as f:
+                            audio.append((os.path.splitext(filename)[1][1:], f.read()))
+                except OSError:
+                    audio = None
+            entry["last_used"] = time.time()
+            self.hits += 1
+            self._save_index()
+            return {"text": entry["text"], "audio": audio}
+
+    def put(self, assistant, transcript, text, audio=None):
+        # audio is a list of per-sentence (format, bytes) clips; None if any sentence couldn't be captured
+        key = self.key(assistant, transcript)
+        with self.lock:
+            self._remove(key)
+            filenames = None
+            size = len(text.encode("utf-8"))
+            if audio is not None and all(clip is not None for clip in audio):
+                filenames = []
+                for i, (audio_format, audio_bytes) in enumerate(audio):
+                    filename = f"{key}_{i}.{audio_format}"
+                    with open(os.path.join(self.cache_dir, filename), "wb") as f:
+                        f.write(audio_bytes)
+                    filenames.append(filename)
+                    size += len(audio_bytes)
+            now = time.time()
+            self.index[key] = {
+                "assistant": assistant,
+                "transcript": self.normalize(transcript),
+                "text": text,
+                "audio": filenames,
+                "size": size,
+                "created": now,
+                "last_used": now,
+            }
+            self._evict()
+            self._save_index()
+
+    def _remove(self, key):
+        entry = self.index.pop(key, None)
+        if entry is None or entry["audio"] is None:
+            return
+        for filename in entry["audio"]:
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
+
+    def _evict(self):
+        now = time.time()
+        for key in [key for key, entry in self.index.items() if now - entry["created"] > self.ttl_seconds]:
+            self._remove(key)
+        total = sum(entry["size"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda key: self.index[key]["last_used"]):
+            if len(self.index) <= self.max_entries and total <= self.max_bytes:
+                break
+            total -= self.index[key]["size"]
+            self._remove(key)
+
+    def _save_index(self):
+        with open(self.index_file, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.index), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,173 @@
+import argparse
+import json
+import re
+
+# a sentence ends at . ! or ? (plus closing quotes/brackets) once whitespace follows;
+# ! and ? can't be part of a number or abbreviation, so they also count at the end of the text
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)|[!?]+[\"')\]]*$")
+CLAUSE_END = re.compile(r"[,;:][\"')\]]*(?=\s)|\s[-–—]+(?=\s)")
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "e.g.", "i.e.", "a.m.", "p.m."}
+
+class SentenceSegmenter:
+    """
+    Splits streamed LLM text into chunks for the TTS engine as soon as they're complete.
+
+    Boundaries are found anywhere in the text, not only at the end of a delta. Until
+    the first chunk has gone out, any sentence is flushed however short, and a clause
+    ending in , ; : or a dash is flushed once it has first_clause_words words, so a long
+    opening sentence doesn't hold up the first audio. After that, sentences shorter than
+    min_chars are joined to the next one to save a TTS request, and text with no
+    boundary is cut at a word once it reaches max_chars.
+    """
+
+    def __init__(self, first_clause_words=8, min_chars=15, max_chars=250):
+        self.first_clause_words = first_clause_words
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.reset()
+
+    def reset(self):
+        self.buffer = ""
+        self.segment_count = 0
+
+    def feed(self, text):
+        """Adds a delta and returns the list of chunks (possibly empty) now ready to speak."""
+        self.buffer += text.replace("\n", " ")
+        segments = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            segment = self.buffer[:cut].strip()
+            self.buffer = self.buffer[cut:].lstrip()
+            if segment:
+                segments.append(segment)
+                self.segment_count += 1
+        return segments
+
+    def flush(self):
+        """Returns whatever text is left once the stream has ended, or None."""
+        segment = self.buffer.strip()
+        self.buffer = ""
+        if not segment:
+            return None
+        self.segment_count += 1
+        return segment
+
+    def _find_cut(self):
+        for match in SENTENCE_END.finditer(self.buffer):
+            if self._is_abbreviation(match.start()):
+                continue
+            if self.segment_count == 0 or len(self.buffer[:match.end()].strip()) >= self.min_chars:
+                return match.end()
+        if self.segment_count == 0 and self.first_clause_words:
+            for match in CLAUSE_END.finditer(self.buffer):
+                if len(self.buffer[:match.start()].split()) >= self.first_clause_words:
+                    return match.end()
+        if len(self.buffer) > self.max_chars:
+            cut = self.buffer.rfind(" ", 0, self.max_chars)
+            return cut if cut > 0 else self.max_chars
+        return None
+
+    def _is_abbreviation(self, end):
+        words = self.buffer[:end + 1].split()
+        return bool(words) and words[-1].lower() in ABBREVIATIONS
+
+def legacy_segments(deltas):
+    # the rule text_iterator used before: flush when a delta ends with . ! or ?
+    sentence = ""
+    for delta in deltas:
+        sentence += delta.replace("\n", " ")
+        if delta and delta[-1] in {".", "!", "?"}:
+            yield sentence
+            sentence = ""
+    if sentence:
+        yield sentence
+
+def new_segments(deltas, segmenter):
+    segmenter.reset()
+    for delta in deltas:
+        for segment in segmenter.feed(delta):
+            yield segment
+    segment = segmenter.flush()
+    if segment:
+        yield segment
+
+def load_recording(path):
+    """A recording is a JSON list of [seconds since the request was sent, delta] pairs."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(float(offset), delta) for offset, delta in json.load(f)]
+
+def synthetic_recording(text, first_token_seconds=0.35, tokens_per_second=40):
+    # splits text into word-ish tokens the way a chat completion stream does
+    tokens = re.findall(r"\s*\S+?(?=[\s.,!?;:]|$)|\s*[.,!?;:]+", text)
+    return [(first_token_seconds + i / tokens_per_second, token) for i, token in enumerate(tokens)]
+
+SAMPLE_ANSWERS = [
+    "Hi. I think dinosaurs are super cool, especially the big ones with long necks that munched on leaves all day long!",
+    "Well, the sky looks blue because sunlight bumps into tiny bits of air, and blue light bounces around the most. Pretty neat, right?",
+    "Sure! Here's one. Why did the cookie go to the doctor? Because it felt crummy!",
+    "A tiger can run about 40 miles per hour, which is faster than a car driving through a neighborhood, but only for short bursts.",
+    "Yes. No. Maybe. Okay, let's count to five together: one, two, three, four, five!",
+]
+
+def replay(recording, make_iterator):
+    """Returns (seconds until the first chunk is ready, chunks) for one recorded stream."""
+    current = {"time": 0.0}
+
+    def deltas():
+        for offset, delta in recording:
+            current["time"] = offset
+            yield delta
+        current["time"] = recording[-1][0] if recording else 0.0
+
+    first_time = None
+    segments = []
+    for segment in make_iterator(deltas()):
+        if first_time is None:
+            first_time = current["time"]
+        segments.append(segment)
+    return first_time, segments
+
+def benchmark(recordings, segmenter, tts_first_audio_seconds):
+    rows = {"legacy": [], "segmenter": []}
+    for name, recording in recordings:
+        for label, make_iterator in (("legacy", legacy_segments), ("segmenter", lambda deltas: new_segments(deltas, segmenter))):
+            first_time, segments = replay(recording, make_iterator)
+            rows[label].append({
+                "recording": name,
+                "first_speech_seconds": first_time + tts_first_audio_seconds,
+                "tts_requests": len(segments),
+                "first_chunk": segments[0] if segments else "",
+            })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares time to first speech of the old and new sentence chunking on LLM token streams.")
+    parser.add_argument("recordings", nargs="*", help="JSON recordings of [seconds, delta] pairs (see llm_stream_recording_dir in config.json); built-in sample answers are used if none are given")
+    parser.add_argument("--first-clause-words", type=int, default=8)
+    parser.add_argument("--min-chars", type=int, default=15)
+    parser.add_argument("--tts-first-audio", type=float, default=0.4, help="seconds the TTS engine takes to start speaking a chunk")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    if args.recordings:
+        recordings = [(path, load_recording(path)) for path in args.recordings]
+    else:
+        recordings = [(f"sample {i + 1}", synthetic_recording(text)) for i, text in enumerate(SAMPLE_ANSWERS)]
+    segmenter = SentenceSegmenter(args.first_clause_words, args.min_chars)
+    rows = benchmark(recordings, segmenter, args.tts_first_audio)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    for label, results in rows.items():
+        print(f"{label}:")
+        for result in results:
+            print(f"  {result['recording']}: first speech {result['first_speech_seconds']:.2f}s, "
+                  f"{result['tts_requests']} TTS requests, first chunk {result['first_chunk']!r}")
+        mean_first = sum(result["first_speech_seconds"] for result in results) / len(results)
+        total_requests = sum(result["tts_requests"] for result in results)
+        print(f"  mean first speech {mean_first:.2f}s, {total_requests} TTS requests total")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,47 @@
 import os
 import random
-from pydub import AudioSegment
-from pydub.playback import _play_with_simpleaudio
+import threading
+import numpy as np
+from audio_mixer import get_audio_mixer, PRIORITY_ALARM, PRIORITY_BACKGROUND, PRIORITY_EFFECT
 
 sounds_dir = os.path.dirname(os.path.abspath(__file__)) + "/sounds"
+sound_cache_dir = os.path.dirname(os.path.abspath(__file__)) + "/sound_cache"
+# decoded sounds at least this big are kept in a file and memory-mapped instead of on the heap
+MEMMAP_MIN_BYTES = 1024 * 1024
+
+# every sound decoded to the mixer's format, shared by all SoundEffectService instances
+decoded_sounds = {}
+decoded_sounds_lock = threading.Lock()
+
+def load_sound(path):
+    """Returns the wav at path as mixer-format samples, decoding it at most once per process."""
+    with decoded_sounds_lock:
+        samples = decoded_sounds.get(path)
+        if samples is None:
+            samples = decode_sound(path)
+            decoded_sounds[path] = samples
+        return samples
+
+def decode_sound(path):
+    mixer = get_audio_mixer()
+    relative_name = os.path.relpath(path, sounds_dir).replace(os.sep, "_")
+    pcm_path = os.path.join(sound_cache_dir, f"{os.path.splitext(relative_name)[0]}_{mixer.sample_rate}_{mixer.channels}.pcm")
+    if os.path.exists(pcm_path) and os.path.getmtime(pcm_path) >= os.path.getmtime(path):
+        return np.memmap(pcm_path, dtype=np.int16, mode="r").reshape(-1, mixer.channels)
+    # pydub is only needed when there's no decoded copy yet
+    from pydub import AudioSegment
+    samples = mixer.to_samples(AudioSegment.from_file(path, format="wav"))
+    if samples.nbytes < MEMMAP_MIN_BYTES:
+        return samples
+    try:
+        if not os.path.exists(sound_cache_dir):
+            os.makedirs(sound_cache_dir)
+        samples.tofile(pcm_path + ".tmp")
+        os.replace(pcm_path + ".tmp", pcm_path)
+        return np.memmap(pcm_path, dtype=np.int16, mode="r").reshape(-1, mixer.channels)
+    except OSError as e:
+        print(f"Failed to cache decoded sound {path}: {e}")
+        return samples
 
 class SoundEffectService:
     def __init__(self, config=None):
@@ -16,6 +54,7 @@ class SoundEffectService:
         self.generic_sound_names = ["error", "awake", "done", "initializing", "loading", "halflifebutton", "alarm", "timer"]
         self.awake_sound_names = ["listening", "you_called", "yes", "hello"]
         self.filler_sound_names = ["ummm", "ehhh", "uhhhh", "hmmm"]
+        self.alarm_sound_names = ["alarm", "timer"]
 
     def get_random_wake_sound(self):
         return self.awake_sound_names[random.randint(0, len(self.awake_sound_names) - 1)]
@@ -24,7 +63,16 @@ class SoundEffectService:
         return self.filler_sound_names[random.randint(0, len(self.filler_sound_names) - 1)]
 
     def get_sound(self, sound_name, assistant_name):
-        return AudioSegment.from_file(os.path.join(sounds_dir, assistant_name if not sound_name in self.generic_sound_names else "", f"{sound_name}.wav"), format="wav")
+        return load_sound(os.path.join(sounds_dir, assistant_name if not sound_name in self.generic_sound_names else "", f"{sound_name}.wav"))
+
+    def preload(self):
+        # decodes the assistant's cue sounds ahead of time so the first play() starts straight away
+        sound_names = self.generic_sound_names + self.awake_sound_names + self.filler_sound_names + ["ready", "hi_how_can_i_help", "something_went_wrong"]
+        for sound_name in sound_names:
+            try:
+                self.get_sound(sound_name, self.assistant_name)
+            except Exception as e:
+                print(f"Failed to preload sound '{sound_name}': {e}")
 
     def play(self, sound_name, loop=False):
         sound = self.get_sound(sound_name, self.assistant_name)
@@ -33,8 +81,11 @@ class SoundEffectService:
         if self.player is not None:
             self.stop_sound()
         #print(f"Playing sound effect: {sound_name}")
-        sound = sound * (99 if loop else 1)
-        self.player = _play_with_simpleaudio(sound)
+        if sound_name in self.alarm_sound_names:
+            priority = PRIORITY_ALARM
+        else:
+            priority = PRIORITY_BACKGROUND if loop else PRIORITY_EFFECT
+        self.player = get_audio_mixer().play(sound, priority=priority, loop=loop)
 
         if not loop:
             self.player.wait_done()
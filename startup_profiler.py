@@ -0,0 +1,82 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+class StartupProfiler:
+    """
+    Records how long each phase of startup takes, from main.py's first import until the
+    wake word loop is listening.
+
+    phase() times a block of code and mark() ends a phase that began at the previous
+    mark, which suits straight-line module code. finish() prints the phases in the order
+    they started and writes them to report_file; only the first startup is recorded, not
+    the ones after restart_app().
+    """
+
+    def __init__(self, report_file=os.path.join(script_dir, "startup_profile.json")):
+        self.report_file = report_file
+        self.start_time = time.perf_counter()
+        self.last_mark = self.start_time
+        self.phases = []
+        self.finished = False
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def mark(self, name):
+        now = time.perf_counter()
+        with self.lock:
+            start = self.last_mark
+            self.last_mark = now
+        self._record(name, start, now)
+
+    def _record(self, name, start, end):
+        with self.lock:
+            if self.finished:
+                return
+            self.phases.append({
+                "name": name,
+                "start": round(start - self.start_time, 3),
+                "seconds": round(end - start, 3),
+                "thread": threading.current_thread().name,
+            })
+
+    def finish(self):
+        """Prints the report and writes it to report_file. Returns the report, or None if already finished."""
+        with self.lock:
+            if self.finished:
+                return None
+            self.finished = True
+            report = {
+                "total_seconds": round(time.perf_counter() - self.start_time, 3),
+                "phases": sorted(self.phases, key=lambda phase: phase["start"]),
+            }
+        print(f"Startup took {report['total_seconds']} seconds:")
+        for phase in report["phases"]:
+            print(f"  {phase['start']:7.3f}s  {phase['seconds']:7.3f}s  {phase['name']}")
+        try:
+            with open(self.report_file, "w") as f:
+                json.dump(report, f, indent=4)
+        except OSError as e:
+            print(f"Failed to write the startup profile: {e}")
+        return report
+
+startup_profiler = None
+startup_profiler_lock = threading.Lock()
+
+def get_startup_profiler():
+    global startup_profiler
+    with startup_profiler_lock:
+        if startup_profiler is None:
+            startup_profiler = StartupProfiler()
+        return startup_profiler
@@ -41,11 +41,43 @@ function adjustChatContainerHeight() {
         chatLog.style.height = availableHeight + 'px';
     }
 }
-function populateChatLog(chatLogData) {
+function populateChatLog(chatLogData, date, noScroll) {
+    if (chatLogData.length >= chatPageSize)
+        addEarlierMessagesButton(date);
     chatLogData.forEach(function(message) {
-        update_chat(message); 
+        update_chat(message, noScroll); 
     });
 }
+function addEarlierMessagesButton(date) {
+    // pages load only the latest messages, this fetches the ones before them
+    var chatLog = document.getElementById('chat-log');
+    var button = document.createElement('button');
+    button.id = 'earlierMessagesButton';
+    button.textContent = 'Show earlier messages';
+    button.onclick = function () {
+        var firstMessage = chatLogData.find(message => message.id);
+        if (!firstMessage)
+            return;
+        fetch(`/chatlog/${date || ''}?before_id=${firstMessage.id}&limit=${chatPageSize}`)
+            .then(response => response.json())
+            .then(earlierMessages => {
+                chatLogData = earlierMessages.concat(chatLogData);
+                chatLog.innerHTML = '';
+                populateChatLog(chatLogData, date, true);
+                if (earlierMessages.length < chatPageSize)
+                    document.getElementById('earlierMessagesButton')?.remove();
+            })
+            .catch(error => console.error('Error fetching earlier messages:', error));
+    };
+    chatLog.appendChild(button);
+}
+function localDateString() {
+    const today = new Date();
+    const year = today.getFullYear();
+    const month = String(today.getMonth() + 1).padStart(2, '0'); // Months are zero-based
+    const day = String(today.getDate()).padStart(2, '0');
+    return `${year}-${month}-${day}`;
+}
 function scrollToBottom() {
     var chatLog = document.getElementById('chat-log');
     var images = chatLog.getElementsByTagName('img');
@@ -82,7 +114,7 @@ function setStatusMsg(msg, error) {
     }
 }
 
-function update_chat(data) {
+function update_chat(data, noScroll) {
     if (!data) {
         return;
     }
@@ -130,7 +162,8 @@ function update_chat(data) {
         if (messageContent)
             chatLog.appendChild(newMessage);
     }
-    scrollToBottom();
+    if (!noScroll)
+        scrollToBottom();
 }
 function enable_prompting() {
     if (images_disabled)
@@ -171,18 +204,13 @@ function chatbot_ready(data) {
 if (location.toString().includes('/history')) {
     document.addEventListener('DOMContentLoaded', function () {
         setActiveLink();
-        populateChatLog(chatLogData);
+        populateChatLog(chatLogData, localDateString());
         adjustChatContainerHeight();
         window.onload = scrollToBottom;
         window.addEventListener('resize', adjustChatContainerHeight);
 
         var dateSelector = document.getElementById('dateSelector');
-        const today = new Date();
-        const year = today.getFullYear();
-        const month = String(today.getMonth() + 1).padStart(2, '0'); // Months are zero-based
-        const day = String(today.getDate()).padStart(2, '0');
-        const localDate = `${year}-${month}-${day}`;
-        dateSelector.value = localDate;
+        dateSelector.value = localDateString();
         dateSelector.addEventListener('change', function () {
             var selectedDate = dateSelector.value;
             fetchChatLogForDate(selectedDate);
@@ -190,14 +218,13 @@ if (location.toString().includes('/history')) {
     });
 
     function fetchChatLogForDate(date) {
-        fetch(`/chatlog/${date}`)
+        fetch(`/chatlog/${date}?limit=${chatPageSize}`)
             .then(response => response.json())
-            .then(chatLogData => {
+            .then(messages => {
                 var chatLog = document.getElementById('chat-log');
                 chatLog.innerHTML = '';
-                chatLogData.forEach(function(message) {
-                    update_chat(message);
-                });
+                chatLogData = messages;
+                populateChatLog(chatLogData, date);
             })
             .catch(error => console.error('Error fetching chat log:', error));
     }        
@@ -231,7 +258,7 @@ else if (location.toString().includes('/settings')) {
 else {
     document.addEventListener('DOMContentLoaded', function () {
         setActiveLink();
-        populateChatLog(chatLogData);
+        populateChatLog(chatLogData, localDateString());
         adjustChatContainerHeight();
         window.onload = scrollToBottom;
         window.addEventListener('resize', adjustChatContainerHeight);
@@ -444,6 +471,10 @@ else {
             }
         });
 
+        socket.on('partial_transcript', function(data) {
+            setStatusMsg('Heard: ' + data.message);
+        });
+
         socket.on('chatbot_ready', chatbot_ready);
 
         document.getElementById('form').addEventListener('submit', submit_form);
@@ -0,0 +1,127 @@
+import json
+import os
+from abc import ABC, abstractmethod
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+class STTBackend(ABC):
+    """
+    Speech-to-text backend used by InputListener.
+
+    Every backend can transcribe() a whole recorded phrase. Backends that can also be
+    fed audio while the user is still talking derive from StreamingSTTBackend.
+    """
+
+    @abstractmethod
+    def transcribe(self, audio_data):
+        """The text of a recorded phrase (a speech_recognition AudioData)."""
+
+class StreamingSTTBackend(STTBackend):
+    """
+    start() opens an utterance, accept_audio() takes raw 16-bit mono chunks and
+    returns the current partial transcript, and finish() returns the final text.
+    """
+
+    @abstractmethod
+    def start(self, sample_rate):
+        pass
+
+    @abstractmethod
+    def accept_audio(self, data):
+        pass
+
+    @abstractmethod
+    def finish(self):
+        pass
+
+    def transcribe(self, audio_data):
+        # a recorded phrase is streamed through in one chunk
+        self.start(audio_data.sample_rate)
+        self.accept_audio(audio_data.get_raw_data(convert_width=2))
+        return self.finish()
+
+class GoogleSTTBackend(STTBackend):
+    def __init__(self, rec, language):
+        self.rec = rec
+        self.language = language
+
+    def transcribe(self, audio_data):
+        return self.rec.recognize_google(audio_data, language=self.language)
+
+# Vosk models take a while to load, so keep them around across restarts
+vosk_models = {}
+
+class VoskSTTBackend(StreamingSTTBackend):
+    """Offline streaming recognizer using Vosk (https://alphacephei.com/vosk/models)."""
+
+    def __init__(self, model_path):
+        import vosk
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        if model_path not in vosk_models:
+            print(f"Loading Vosk model from {model_path}...")
+            vosk_models[model_path] = vosk.Model(model_path)
+        self.model = vosk_models[model_path]
+        self.recognizer = None
+        self.segments = []
+
+    def start(self, sample_rate):
+        self.recognizer = self.vosk.KaldiRecognizer(self.model, sample_rate)
+        self.segments = []
+
+    def accept_audio(self, data):
+        if self.recognizer.AcceptWaveform(data):
+            # vosk finalized a segment at a pause; keep it and start the next one
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            return " ".join(self.segments)
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(self.segments + ([partial] if partial else []))
+
+    def finish(self):
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        if text:
+            self.segments.append(text)
+        self.recognizer = None
+        return " ".join(self.segments) or None
+
+class FakeSTTBackend(StreamingSTTBackend):
+    """
+    Local stand-in for testing without a network or a speech model.
+
+    Streams the configured transcript back one word at a time as audio arrives,
+    so the streaming path in InputListener can be exercised end to end.
+    """
+
+    def __init__(self, transcript, bytes_per_word=16000):
+        self.words = transcript.split()
+        self.bytes_per_word = bytes_per_word
+        self.received = 0
+
+    def transcribe(self, audio_data):
+        return " ".join(self.words)
+
+    def start(self, sample_rate):
+        self.received = 0
+
+    def accept_audio(self, data):
+        self.received += len(data)
+        return " ".join(self.words[:self.received // self.bytes_per_word])
+
+    def finish(self):
+        return " ".join(self.words) or None
+
+def get_stt_backend(config, rec):
+    backend = config.get("stt_backend", "google")
+    if backend == "vosk":
+        model_path = config.get("vosk_model_path", "vosk_model")
+        if not os.path.isabs(model_path):
+            model_path = os.path.join(script_dir, model_path)
+        try:
+            return VoskSTTBackend(model_path)
+        except Exception as e:
+            print(f"Failed to load Vosk STT backend, falling back to google: {e}")
+    elif backend == "fake":
+        return FakeSTTBackend(config.get("fake_stt_transcript", "what time is it"))
+    return GoogleSTTBackend(rec, config["language"] + "-US")
@@ -0,0 +1,37 @@
+import collections
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("pyaudio")
+
+from audio_mixer import AudioMixer, MixerSource, PRIORITY_BACKGROUND, PRIORITY_SPEECH
+
+def make_mixer():
+    # only the mixing is tested, so no output stream is opened
+    mixer = AudioMixer.__new__(AudioMixer)
+    mixer.sample_rate, mixer.channels, mixer.duck_gain = 44100, 2, 0.5
+    return mixer
+
+def test_stopped_source_waiting_in_a_channel_is_skipped():
+    mixer = make_mixer()
+    first = MixerSource(np.full((4, 2), 100, dtype=np.int16), PRIORITY_SPEECH, False, 1.0)
+    second = MixerSource(np.full((4, 2), 200, dtype=np.int16), PRIORITY_SPEECH, False, 1.0)
+    third = MixerSource(np.full((4, 2), 300, dtype=np.int16), PRIORITY_SPEECH, False, 1.0)
+    sources = collections.deque([first, second, third])
+    second.stop()
+    out = np.zeros((8, 2), dtype=np.float32)
+    mixer._mix_channel(sources, out, 8, PRIORITY_SPEECH)
+    assert out[:, 0].tolist() == [100] * 4 + [300] * 4
+
+def test_lower_priority_loop_is_ducked():
+    mixer = make_mixer()
+    loop = MixerSource(np.full((4, 2), 100, dtype=np.int16), PRIORITY_BACKGROUND, True, 1.0)
+    loop.current_gain = mixer.duck_gain
+    out = np.zeros((8, 2), dtype=np.float32)
+    mixer._mix_channel(collections.deque([loop]), out, 8, PRIORITY_SPEECH)
+    assert out[:, 0].tolist() == [50] * 8
+    assert loop.is_playing()
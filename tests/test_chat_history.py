@@ -0,0 +1,47 @@
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chat_history
+from chat_history import ChatHistory
+
+ASSISTANTS = {"jarvis": {"name": "Jarvis"}}
+
+def write_log(chatlog_dir, text):
+    path = os.path.join(chatlog_dir, f"jarvis_chatlog-{date.today()}.txt")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+def test_partial_tail_without_newline(tmp_path):
+    # the first exchange of the day: "You: ..." is written without a newline and the answer streams onto the same line
+    write_log(tmp_path, "You: why is the sky blueJarvis: Because ")
+    history = ChatHistory(str(tmp_path / "chat_history.db"), str(tmp_path), ASSISTANTS)
+    messages = history.get_messages("jarvis", str(date.today()))
+    assert messages == [{"id": None, "message": "You: why is the sky blueJarvis: Because"}]
+
+    write_log(tmp_path, "of Rayleigh scattering.\nYou: thanks\n")
+    messages = history.get_messages("jarvis", str(date.today()))
+    assert [message["message"] for message in messages] == [
+        "You: why is the sky blueJarvis: Because of Rayleigh scattering.",
+        "You: thanks",
+    ]
+    assert messages[0]["id"] is not None
+    history.close()
+
+def test_last_message_indexed_after_midnight(tmp_path, monkeypatch):
+    write_log(tmp_path, "You: why is the sky blue\nJarvis: Because of Rayleigh scattering.\n")
+    history = ChatHistory(str(tmp_path / "chat_history.db"), str(tmp_path), ASSISTANTS)
+    assert history.sync() == 1
+    assert history.search("Rayleigh") == []
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+    monkeypatch.setattr(chat_history, "dt_date", Tomorrow)
+    # the log hasn't changed since the last sync, but its day is over
+    assert history.sync() == 1
+    assert [result["message"] for result in history.search("Rayleigh")] == ["Jarvis: Because of Rayleigh scattering."]
+    assert history.sync() == 0
+    history.close()
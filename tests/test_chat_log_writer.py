@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_log_writer import ChatLogWriter
+
+def test_write_after_close_is_not_dropped(tmp_path):
+    filename = str(tmp_path / "jarvis_chatlog-2024-01-01.txt")
+    writer = ChatLogWriter()
+    writer.write(filename, "You: hello \n")
+    writer.close()
+    writer.write(filename, "Jarvis: Goodbye! \n")
+    with open(filename, encoding="utf-8") as f:
+        assert f.read() == "You: hello \nJarvis: Goodbye! \n"
+    assert writer.stats()["written"] == 1
+
+def test_close_doesnt_block_on_a_full_queue(tmp_path):
+    writer = ChatLogWriter(max_queue=1)
+    # a writer thread that has died leaves the queue full
+    writer.entries.put(None)
+    writer.thread.join()
+    writer.write(str(tmp_path / "log.txt"), "You: hello \n")
+    assert writer.entries.full()
+    writer.close(timeout=0.1)
+    assert writer.closed
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import CASE_SENSITIVE_INTENTS, DEFAULT_INTENTS, IntentRouter, _legacy_match
+
+def make_router(intents):
+    router = IntentRouter()
+    for name, phrases in intents:
+        router.register(name, phrases, None, case_sensitive=name in CASE_SENSITIVE_INTENTS)
+    return router
+
+def matched_name(router, transcript):
+    intent = router.match(transcript)
+    return intent.name if intent else None
+
+def test_shorter_phrase_of_earlier_intent_wins():
+    # "play music" is the start of "play music loudly"; the regex alone only reports the longer one
+    intents = [("first", ["play music"]), ("second", ["play music loudly"])]
+    assert matched_name(make_router(intents), "please play music loudly") == "first"
+    assert matched_name(make_router(list(reversed(intents))), "please play music loudly") == "second"
+
+def test_prefix_phrases_match_like_the_cascade():
+    intents = list(DEFAULT_INTENTS) + [("stop_everything", ["stop playing music now"])]
+    router = make_router(intents)
+    for transcript in ["stop playing music now", "set a timer for 5 minutes", "play the kids radio",
+                       "delete all alarms", "cancel all timers please", "switch voice assistant to TARS"]:
+        assert matched_name(router, transcript) == _legacy_match(intents, transcript), transcript
+
+def test_time_intent_is_case_sensitive():
+    router = make_router(DEFAULT_INTENTS)
+    assert matched_name(router, "what time is it") == "time"
+    assert matched_name(router, "What time is it") is None
+    assert matched_name(router, "Play the radio") == "radio"
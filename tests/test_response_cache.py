@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache
+
+def test_follow_up_not_cacheable_in_conversation(tmp_path):
+    # process_transcript neither looks these up nor stores them when is_cacheable() says no
+    cache = ResponseCache(str(tmp_path))
+    for transcript in ["why?", "tell me more", "and the second one?", "what about it"]:
+        assert not cache.is_cacheable(transcript, has_context=True)
+
+def test_standalone_question_still_cached_in_conversation(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.is_cacheable("what is the capital of france", has_context=True)
+    assert cache.is_cacheable("why?")
+    assert not cache.is_cacheable("what's the weather like", has_context=True)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt_backends import FakeSTTBackend, STTBackend, StreamingSTTBackend
+
+class RecordedPhrase:
+    # the parts of speech_recognition.AudioData a streaming backend uses
+    def __init__(self, data, sample_rate=16000):
+        self.data = data
+        self.sample_rate = sample_rate
+
+    def get_raw_data(self, convert_rate=None, convert_width=None):
+        return self.data
+
+def test_fake_backend_streams_words_as_audio_arrives():
+    backend = FakeSTTBackend("what time is it", bytes_per_word=4)
+    assert isinstance(backend, StreamingSTTBackend)
+    backend.start(16000)
+    assert backend.accept_audio(b"\0" * 4) == "what"
+    assert backend.accept_audio(b"\0" * 8) == "what time is"
+    assert backend.finish() == "what time is it"
+
+def test_streaming_backend_transcribes_a_recorded_phrase():
+    class Echo(StreamingSTTBackend):
+        def start(self, sample_rate):
+            self.sample_rate, self.data = sample_rate, b""
+
+        def accept_audio(self, data):
+            self.data += data
+            return ""
+
+        def finish(self):
+            return f"{len(self.data)} bytes at {self.sample_rate} Hz"
+
+    assert Echo().transcribe(RecordedPhrase(b"\0" * 10, 8000)) == "10 bytes at 8000 Hz"
+
+def test_backends_must_implement_the_abstract_methods():
+    with pytest.raises(TypeError):
+        STTBackend()
+
+    class NoFinish(StreamingSTTBackend):
+        def start(self, sample_rate):
+            pass
+
+        def accept_audio(self, data):
+            return ""
+
+    with pytest.raises(TypeError):
+        NoFinish()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_cache import is_fixed_phrase
+
+def test_only_fixed_phrases_are_cached():
+    assert is_fixed_phrase("Radio stopped.")
+    assert is_fixed_phrase("I'm already Jarvis.")
+    assert not is_fixed_phrase("Timer set for 5 minutes, ")
+    assert not is_fixed_phrase("Alarm set for 07:30 AM")
@@ -0,0 +1,161 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# phrases the app speaks the same way every time; prefilled so they never wait on a TTS service
+FIXED_PHRASES = [
+    "{assistant_name} ready!",
+    "Something went wrong!",
+    "Hi, how can I help?",
+    "Radio stopped.",
+    "All alarms and timers deleted",
+    "I'm already {assistant_name}.",
+    "Assistant not found.",
+    "Goodbye!",
+    "No internet connection",
+]
+FIXED_PHRASE_PATTERN = re.compile("|".join(re.escape(phrase).replace(re.escape("{assistant_name}"), r"[\w ]+") for phrase in FIXED_PHRASES))
+
+def is_fixed_phrase(text):
+    # only these are worth keeping; one-off answers (the time, "Timer set for ...") would just churn the cache
+    return FIXED_PHRASE_PATTERN.fullmatch(" ".join(text.split())) is not None
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache of synthesized speech.
+
+    Each clip is stored as <sha256 of engine, voice, language, accent and text>.<format>.
+    A hit touches the file, so file modification times order the entries for least
+    recently used eviction once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.total_bytes = sum(os.path.getsize(os.path.join(cache_dir, filename)) for filename in os.listdir(cache_dir))
+
+    def normalize(self, text):
+        return " ".join(text.split())
+
+    def key(self, engine, voice_id, language, accent, text):
+        return hashlib.sha256("\n".join([engine, voice_id or "", language or "", accent or "", self.normalize(text)]).encode("utf-8")).hexdigest()
+
+    def get(self, engine, voice_id, language, accent, text):
+        """Returns (format, audio bytes) or None on a miss."""
+        key = self.key(engine, voice_id, language, accent, text)
+        with self.lock:
+            for audio_format in ("pcm_22050", "mp3", "wav"):
+                path = os.path.join(self.cache_dir, f"{key}.{audio_format}")
+                try:
+                    with open(path, "rb") as f:
+                        audio_bytes = f.read()
+                    os.utime(path)
+                except OSError:
+                    continue
+                self.hits += 1
+                return (audio_format, audio_bytes)
+            self.misses += 1
+            return None
+
+    def put(self, engine, voice_id, language, accent, text, clip):
+        audio_format, audio_bytes = clip
+        key = self.key(engine, voice_id, language, accent, text)
+        path = os.path.join(self.cache_dir, f"{key}.{audio_format}")
+        with self.lock:
+            if os.path.exists(path):
+                self.total_bytes -= os.path.getsize(path)
+            try:
+                # write to a temporary name first so a reader never sees a half-written clip
+                with open(path + ".tmp", "wb") as f:
+                    f.write(audio_bytes)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                print(f"Failed to cache speech for '{text}': {e}")
+                return
+            self.total_bytes += len(audio_bytes)
+            self._evict()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        paths = [os.path.join(self.cache_dir, filename) for filename in os.listdir(self.cache_dir)]
+        for path in sorted(paths, key=os.path.getmtime):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self.total_bytes -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(os.listdir(self.cache_dir)),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+# one cache per directory, shared by every TextToSpeechService in the process
+tts_caches = {}
+tts_caches_lock = threading.Lock()
+
+def get_tts_cache(config):
+    if not config.get("tts_cache_enabled", True):
+        return None
+    cache_dir = config.get("tts_cache_dir") or os.path.join(script_dir, "tts_cache")
+    with tts_caches_lock:
+        if cache_dir not in tts_caches:
+            tts_caches[cache_dir] = TTSCache(cache_dir, config.get("tts_cache_max_mb", 100) * 1024 * 1024)
+        return tts_caches[cache_dir]
+
+def prefill(config, assistants, names=None):
+    # imported here because tts_service imports this module
+    from tts_service import TextToSpeechService
+    for name, assistant in assistants.items():
+        if names and name not in names:
+            continue
+        assistant_config = copy.deepcopy(config)
+        assistant_config["assistant"] = name
+        assistant_config["assistant_dict"] = assistant
+        speech = TextToSpeechService(assistant_config)
+        for phrase in FIXED_PHRASES:
+            text = phrase.replace("{assistant_name}", assistant["name"])
+            if speech.get_cached_clip(text) is not None:
+                continue
+            if speech.cache_clip(text) is None:
+                print(f"{assistant['name']}: failed to synthesize '{text}'")
+            else:
+                print(f"{assistant['name']}: cached '{text}'")
+    cache = get_tts_cache(config)
+    if cache is not None:
+        print(f"TTS cache: {cache.stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fills the TTS cache with each assistant's fixed phrases.")
+    parser.add_argument("assistants", nargs="*", help="assistants to prefill (default: all in assistants.json)")
+    args = parser.parse_args()
+    with open(os.path.join(script_dir, "config.json")) as f:
+        config = json.load(f)
+    with open(os.path.join(script_dir, "assistants.json")) as f:
+        assistants = json.load(f)
+    if not config.get("tts_cache_enabled", True):
+        print("The TTS cache is disabled in config.json (tts_cache_enabled).")
+        return
+    prefill(config, assistants, args.assistants)
+
+if __name__ == "__main__":
+    main()
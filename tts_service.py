@@ -1,18 +1,24 @@
+import os
+import queue
 import re
-import time
-from elevenlabs import VoiceSettings
-from elevenlabs import stream, play
-from elevenlabs.client import ElevenLabs
-import pyttsx3
-from gtts import gTTS
-from pydub import AudioSegment
-from pydub.playback import play as pyDubPlay
+import tempfile
+import threading
 import io
+import wave
+import numpy as np
+from audio_mixer import get_audio_mixer, PRIORITY_SPEECH
+from http_pool import get_http_pool
+from tts_cache import get_tts_cache, is_fixed_phrase
+import offline_speech
+from offline_speech import get_offline_speech_worker
+
+# raw 16-bit mono PCM, which plays without decoding and can be played a piece at a time as it streams in
+ELEVENLABS_OUTPUT_FORMAT = "pcm_22050"
 
 class TextToSpeechService:
     def __init__(self, config):
         self.elevenlabs_key = config["elevenlabs_key"]
-        self.elevenlabs_client = ElevenLabs(api_key = self.elevenlabs_key)
+        self.elevenlabs_client = None
         self.assistant_name = config["assistant_dict"]["name"]
         self.assistant_gender = 0 if config["assistant_dict"]["gender"] == "male" else 1
         self.elevenlabs_voice_id = config["assistant_dict"]["elevenlabs_voice_id"]
@@ -22,98 +28,295 @@ class TextToSpeechService:
         self.accent = config["assistant_dict"]["accent"]
         self.sound_effect = None
         self.is_running = True
+        self.tts_lookahead = config.get("tts_lookahead", 2)
+        self.pipeline = None
+        self.tts_cache = get_tts_cache(config)
+        # the TTS libraries are only imported for the engines that are turned on
+        if self.use_elevenlabs:
+            from elevenlabs.client import ElevenLabs
+            self.elevenlabs_client = ElevenLabs(api_key = self.elevenlabs_key, httpx_client = get_http_pool().httpx_client)
+        if not self.use_elevenlabs and not self.use_gtts:
+            # start the offline engine now rather than on the first sentence
+            get_offline_speech_worker()
 
     def remove_non_ascii(self, text):
         return re.sub(r'[^\x00-\x7F]+', '', text)
 
     def stop(self):
         self.is_running = False
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+        # only if pyttsx3 was ever started; get_offline_speech_worker() would start it just to cancel nothing
+        if offline_speech.offline_speech_worker is not None:
+            offline_speech.offline_speech_worker.cancel()
+        get_audio_mixer().stop_channel("speech")
         if self.sound_effect is not None:
             self.sound_effect.stop_sound()
-    
-    def speak(self, text):
-        textToSpeak = text
-        try:
-            # strip out emojis so we don't try to speak them
-            textToSpeak = self.remove_non_ascii(text)
-            if not self.use_elevenlabs:
-                if self.use_gtts:
-                    self.speak_with_gtts(textToSpeak)
-                    return None
-                self.speak_with_pyttsx3(textToSpeak)
-                return None
 
-            if self.sound_effect is not None:
-                self.sound_effect.stop_sound()
-            print(f"{self.assistant_name}: {text}")
-            stream(self.speech_stream(textToSpeak))
+    def start_pipeline(self, capture=None):
+        # speaks a multi-sentence answer, synthesizing the next sentences while the current one plays
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+        self.pipeline = SpeechPipeline(self, self.tts_lookahead, capture)
+        return self.pipeline
 
-        except Exception as e:
-            print(f"Failed to use elevenlabs for speech ({text}): {e}")
-            if self.use_gtts:
-                self.speak_with_gtts(textToSpeak)
-            else:
-                self.speak_with_pyttsx3(textToSpeak)
+    def preferred_engine(self):
+        return "elevenlabs" if self.use_elevenlabs else "gtts" if self.use_gtts else "pyttsx3"
+
+    def cache_voice(self, engine):
+        # everything besides the text that changes how a clip from this engine sounds
+        voice_id = self.elevenlabs_voice_id if engine == "elevenlabs" else ""
+        return engine, voice_id, self.language, self.accent
+
+    def get_cached_clip(self, text):
+        if self.tts_cache is None or self.preferred_engine() == "pyttsx3":
             return None
-        
-    def speech_stream(self, text):
-        try:
-            # strip out emojis so we don't try to speak them
-            response = self.elevenlabs_client.text_to_speech.convert_as_stream(
-                text=text,
-                voice_id=self.elevenlabs_voice_id,
-                optimize_streaming_latency="0",                
-                output_format="mp3_44100_128",
-                voice_settings=VoiceSettings(
-                    stability=0.8,
-                    similarity_boost=0.8,
-                )
-            )
-            for chunk in response:
-                if not self.is_running:
-                    break
-                yield chunk
+        return self.tts_cache.get(*self.cache_voice(self.preferred_engine()), self.remove_non_ascii(text))
 
-        except Exception as e:
-            print(f"Failed to use elevenlabs for speech ({text}): {e}")
-            if self.use_gtts:
-                self.speak_with_gtts(text)
-            else:
-                self.speak_with_pyttsx3(text)
+    def put_cached_clip(self, engine, text, clip):
+        # pyttsx3 runs locally, so there's nothing to save by caching it
+        if self.tts_cache is not None and engine != "pyttsx3":
+            self.tts_cache.put(*self.cache_voice(engine), text, clip)
+
+    def cache_clip(self, text):
+        # synthesizes text and stores it in the TTS cache; returns the clip or None
+        engine, clip = self._synthesize(self.remove_non_ascii(text))
+        if clip is not None:
+            self.put_cached_clip(engine, self.remove_non_ascii(text), clip)
+        return clip
+
+    def synthesize(self, text, on_chunk=None):
+        # returns (format, audio bytes) for text, trying the same engines in the same order as speak(), or None.
+        # on_chunk, if given, gets each piece of a streamed clip as a (format, bytes) clip as soon as it arrives
+        text = self.remove_non_ascii(text)
+        clip = self.get_cached_clip(text)
+        if clip is not None:
+            return clip
+        engine, clip = self._synthesize(text, on_chunk)
+        if clip is not None and is_fixed_phrase(text):
+            self.put_cached_clip(engine, text, clip)
+        return clip
 
-    def speak_with_gtts(self, text):
+    def _synthesize(self, text, on_chunk=None):
+        # returns (engine, clip)
+        if self.use_elevenlabs:
+            audio_bytes = bytearray()
+            sent = 0
+            try:
+                from elevenlabs import VoiceSettings
+                response = self.elevenlabs_client.text_to_speech.convert_as_stream(
+                    text=text,
+                    voice_id=self.elevenlabs_voice_id,
+                    optimize_streaming_latency="0",
+                    output_format=ELEVENLABS_OUTPUT_FORMAT,
+                    voice_settings=VoiceSettings(
+                        stability=0.8,
+                        similarity_boost=0.8,
+                    )
+                )
+                for chunk in response:
+                    audio_bytes += chunk
+                    # only whole samples; an odd byte waits for the next chunk
+                    end = len(audio_bytes) - len(audio_bytes) % 2
+                    if on_chunk is not None and end > sent:
+                        on_chunk((ELEVENLABS_OUTPUT_FORMAT, bytes(audio_bytes[sent:end])))
+                        sent = end
+                return "elevenlabs", (ELEVENLABS_OUTPUT_FORMAT, bytes(audio_bytes))
+            except Exception as e:
+                print(f"Failed to use elevenlabs for speech ({text}): {e}")
+                if sent:
+                    # the start of it has already played, so another engine can't take over
+                    return None, None
+        if self.use_gtts:
+            try:
+                from gtts import gTTS
+                tts = gTTS(text=text, lang=self.language, tld=self.accent, slow=False)
+                audio_bytes = io.BytesIO()
+                tts.write_to_fp(audio_bytes)
+                return "gtts", ("mp3", audio_bytes.getvalue())
+            except Exception as e:
+                print(f"Failed to use gTTS for speech: {e}")
         try:
-            #print("Speaking with gTTS...")
-            # Create a gTTS object for the current text chunk
-            tts = gTTS(text=text, lang=self.language, tld=self.accent, slow=False)
-            
-            # Save the audio to a BytesIO object
-            audio_bytes = io.BytesIO()
-            tts.write_to_fp(audio_bytes)
-            audio_bytes.seek(0)
-            
-            # Load the audio with pydub
-            audio = AudioSegment.from_file(audio_bytes, format="mp3")
-            
-            if self.sound_effect is not None:
-                self.sound_effect.stop_sound()
-            print(f"{self.assistant_name}: {text}")
-            
-            # Play the audio
-            pyDubPlay(audio)
+            handle, filename = tempfile.mkstemp(suffix=".wav")
+            os.close(handle)
+            try:
+                get_offline_speech_worker().save_to_file(text, filename, self.assistant_gender)
+                with open(filename, "rb") as f:
+                    return "pyttsx3", ("wav", f.read())
+            finally:
+                os.remove(filename)
         except Exception as e:
-            print(f"Failed to use gTTS for speech: {e}")
+            print(f"Failed to use pyttsx3: {e}")
+        return None, None
+
+    def queue_clip(self, clip):
+        # queues a synthesize() result on the mixer's speech channel, right after anything already there
+        audio_format, audio_bytes = clip
+        mixer = get_audio_mixer()
+        audio = None
+        if audio_format.startswith("pcm_"):
+            audio = mixer.convert(np.frombuffer(audio_bytes, dtype=np.int16), int(audio_format[len("pcm_"):]))
+        elif audio_format == "wav":
+            audio = read_wav(audio_bytes, mixer)
+        if audio is None:
+            # gTTS only gives mp3, which still needs ffmpeg to decode
+            from pydub import AudioSegment
+            audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format=audio_format)
+        # the loading loop (self.sound_effect) keeps going under the speech, ducked by the mixer
+        return mixer.play(audio, priority=PRIORITY_SPEECH, channel="speech")
 
-    def speak_with_pyttsx3(self, text):
+    def play_clip(self, clip):
+        self.queue_clip(clip).wait_done()
+    
+    def speak(self, text, capture=None):
+        # capture: optional list that gets the spoken clip appended (None if there was nothing to speak).
+        # a single sentence goes through a pipeline too, so streamed audio plays as it arrives
+        if not self.is_running:
+            return None
+        pipeline = self.start_pipeline(capture)
+        pipeline.add(text)
+        pipeline.finish()
+        return None
+
+    def play_audio(self, clip):
+        # plays a clip previously captured by speak() or a pipeline
+        self.play_clip(clip)
+
+def read_wav(audio_bytes, mixer):
+    # 16-bit wav (what pyttsx3 writes) as mixer samples; None for anything else
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as w:
+            if w.getsampwidth() != 2:
+                return None
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).reshape(-1, w.getnchannels())
+            return mixer.convert(samples, w.getframerate())
+    except (wave.Error, EOFError):
+        return None
+
+class ClipStream:
+    """
+    One sentence's audio, handed from synthesis to playback before it's synthesized.
+
+    A streaming engine adds its pieces as they arrive so playback can start on the
+    first one; for any other engine finish() adds the whole clip.
+    """
+
+    def __init__(self):
+        self.pieces = queue.Queue()
+        self.streamed = False
+
+    def add(self, piece):
+        self.streamed = True
+        self.pieces.put(piece)
+
+    def finish(self, clip):
+        if clip is not None and not self.streamed:
+            self.pieces.put(clip)
+        self.pieces.put(None)
+
+class SpeechPipeline:
+    """
+    Speaks a stream of sentences back to back.
+
+    A synthesis thread turns queued sentences into audio while a playback thread plays
+    the previous ones, so there's no gap while the next sentence is synthesized. Audio
+    streamed by the TTS engine is played as it arrives rather than once the sentence is
+    complete. At most lookahead sentences wait for playback. cancel() stops both the
+    synthesis and the sentence currently playing.
+    """
+
+    def __init__(self, speech, lookahead=2, capture=None):
+        self.speech = speech
+        self.capture = capture
+        self.texts = queue.Queue()
+        self.clips = queue.Queue(maxsize=max(1, lookahead))
+        self.cancelled = threading.Event()
+        self.synthesis_thread = threading.Thread(target=self._synthesize_loop, daemon=True)
+        self.playback_thread = threading.Thread(target=self._playback_loop, daemon=True)
+        self.synthesis_thread.start()
+        self.playback_thread.start()
+
+    def add(self, text):
+        if not self.cancelled.is_set():
+            self.texts.put(text)
+
+    def finish(self):
+        """Waits for everything added to be spoken. Returns False if the pipeline was cancelled."""
+        self.texts.put(None)
+        self.playback_thread.join()
+        self.synthesis_thread.join()
+        if self.speech.pipeline is self:
+            self.speech.pipeline = None
+        return not self.cancelled.is_set()
+
+    def cancel(self):
+        self.cancelled.set()
+        get_audio_mixer().stop_channel("speech")
+        # wake up both threads if they're waiting on a queue
+        self.texts.put(None)
         try:
-            #print("Speaking with pyttsx3...")            
-            engine = pyttsx3.init()
-            voices = engine.getProperty('voices') 
-            engine.setProperty('voice', voices[self.assistant_gender].id)
-            if self.sound_effect is not None:
-                self.sound_effect.stop_sound()
-            print(f"{self.assistant_name}: {text}")
-            engine.say(text)
-            engine.runAndWait()
-        except Exception as e:
-            print(f"Failed to use pyttsx3: {e}")
\ No newline at end of file
+            self.clips.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _get(self, items):
+        while not self.cancelled.is_set():
+            try:
+                return items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _synthesize_loop(self):
+        while True:
+            text = self._get(self.texts)
+            if text is None:
+                break
+            stream = ClipStream()
+            self._put((text, stream))
+            clip = self.speech.synthesize(text, stream.add)
+            stream.finish(clip)
+            if self.capture is not None:
+                self.capture.append(clip)
+        self._put(None)
+
+    def _put(self, item):
+        # blocks while lookahead sentences are already waiting for playback
+        while not self.cancelled.is_set():
+            try:
+                self.clips.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _playback_loop(self):
+        playing = None
+        while True:
+            item = self._get(self.clips)
+            if item is None:
+                break
+            text, stream = item
+            previous = playing
+            printed = False
+            while True:
+                piece = self._get(stream.pieces)
+                if piece is None:
+                    break
+                if not printed:
+                    print(f"{self.speech.assistant_name}: {text}")
+                    printed = True
+                try:
+                    # the mixer starts each piece in the same buffer the one before it ends in
+                    playing = self.speech.queue_clip(piece)
+                except Exception as e:
+                    print(f"Failed to play speech ({text}): {e}")
+                    break
+            if previous is not None and previous is not playing:
+                self._wait(previous)
+        if playing is not None:
+            self._wait(playing)
+
+    def _wait(self, source):
+        while not source.wait_done(0.05):
+            if self.cancelled.is_set():
+                return
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+
+def model_key(model):
+    # the name openWakeWord reports a model's scores under: a file's name up to the first dot,
+    # or for a pre-trained model its name with underscores (plus a version suffix)
+    if os.path.sep in model or model.endswith((".tflite", ".onnx")):
+        return os.path.basename(model).split(".")[0]
+    return model.replace(" ", "_")
+
+def assistant_models(models_dir, oww_model, assistant_name):
+    # an assistant's wake word model files, plus the pre-trained "hey jarvis" for Jarvis
+    models = [os.path.join(models_dir, oww_model.replace("{assistant_name}", assistant_name))]
+    additional = os.path.join(models_dir, oww_model.replace("{assistant_name}", f"{assistant_name}1"))
+    if os.path.exists(additional):
+        models.append(additional)
+    if assistant_name.lower() == "jarvis":
+        models.append("hey jarvis")
+    return models
+
+def wake_word_setup(config, assistants, models_dir):
+    """
+    The wake word models WakeWordDetector loads for config. Returns (model_owners,
+    thresholds, listening_for) as taken by WakeWordScorer: with oww_preload_all_assistants
+    or oww_listen_for_all_assistants every assistant's models are loaded, but only the
+    current assistant is listened for unless it's the latter.
+    """
+    listen_for_all = config.get("oww_listen_for_all_assistants", False)
+    loaded = list(assistants) if listen_for_all or config.get("oww_preload_all_assistants", False) else [config["assistant"]]
+    model_owners = {model: key for key in loaded for model in assistant_models(models_dir, config["oww_model"], assistants[key]["name"])}
+    thresholds = {key: assistants[key].get("wake_word_threshold", 0.5) for key in loaded}
+    listening_for = None if listen_for_all else {config["assistant"]}
+    return model_owners, thresholds, listening_for
+
+class WakeWordScorer:
+    """
+    The energy gate and scoring used on every mic frame by WakeWordDetector.audio_consumer.
+
+    Kept separate from main.py so the offline benchmark (wakeword_benchmark.py) runs
+    frames through exactly the same steps as the live detector.
+    """
+
+    def __init__(self, model, vad_threshold, score_threshold=0.5, tail_seconds=0.75, sample_rate=16000,
+                 model_owners=None, thresholds=None):
+        self.model = model
+        self.vad_threshold = vad_threshold
+        self.score_threshold = score_threshold
+        self.tail_seconds = tail_seconds
+        self.sample_rate = sample_rate
+        self.last_audio_level_over_threshold = 0
+        # for detect(): which assistant each loaded model (path or pre-trained name) belongs to,
+        # each assistant's score threshold, and the assistants being listened for (None for all)
+        self.owner_keys = {model_key(model): owner for model, owner in (model_owners or {}).items()}
+        self.thresholds = thresholds or {}
+        self.listening_for = None
+        self.owners = {}
+
+    def audio_level(self, audio):
+        return np.abs(audio).mean()
+
+    def gate(self, audio_level, now):
+        # if audio level is below the threshold, skip processing,
+        # but if the audio level was just above the threshold in the last 0.75 seconds,
+        # process the audio as its the tail end of the audio
+        if audio_level < self.vad_threshold and now - self.last_audio_level_over_threshold > self.tail_seconds:
+            return False
+        if audio_level > self.vad_threshold:
+            self.last_audio_level_over_threshold = now
+        return True
+
+    def owner(self, key):
+        if key not in self.owners:
+            owner = self.owner_keys.get(key)
+            if owner is None:
+                # pre-trained models are reported with a version suffix, e.g. hey_jarvis_v0
+                owner = next((owner for prefix, owner in self.owner_keys.items() if key.startswith(prefix)), None)
+            self.owners[key] = owner
+        return self.owners[key]
+
+    def detect(self, audio):
+        """
+        Scores a frame with every loaded model; the audio features are computed once and
+        shared by all of them. Returns (assistant, score) for the highest scoring model over
+        its assistant's threshold, or (None, best score) if no wake word listened for was heard.
+        """
+        prediction = self.model.predict(audio)
+        detected, best_score = None, 0.0
+        for key, score in prediction.items():
+            owner = self.owner(key)
+            if owner is None or (self.listening_for is not None and owner not in self.listening_for):
+                continue
+            score = float(score)
+            is_detection = score >= self.thresholds.get(owner, self.score_threshold)
+            if is_detection and (detected is None or score > best_score):
+                detected, best_score = owner, score
+            elif detected is None and not is_detection:
+                best_score = max(best_score, score)
+        return detected, best_score
+
+    def reset(self, duration_seconds=2):
+        # Predict silence so the model's internal feature buffers don't re-trigger on old audio
+        silence_data = np.zeros(int(self.sample_rate * duration_seconds), dtype=np.int16)
+        return self.model.predict(silence_data)
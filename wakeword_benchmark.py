@@ -0,0 +1,183 @@
+# wakeword_benchmark.py
+# Replays WAV files through the same energy gate / WakeWordScorer.detect() path as
+# WakeWordDetector.audio_consumer, without a microphone or PyAudio. By default the models,
+# owners and per-assistant thresholds are the ones the detector loads for config.json;
+# --models compares single model files instead.
+#
+# Example:
+#   python wakeword_benchmark.py recordings/hey_jarvis --negative recordings/background --chunk-sizes 1280 2560
+import argparse
+import glob
+import json
+import os
+import time
+import wave
+import numpy as np
+from openwakeword.model import Model
+from wake_word_scorer import WakeWordScorer, wake_word_setup
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(script_dir, "oww_models")
+config_file = os.path.join(script_dir, "config.json")
+assistants_file = os.path.join(script_dir, "assistants.json")
+
+def find_wav_files(paths):
+    wav_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            wav_files += sorted(glob.glob(os.path.join(path, "**", "*.wav"), recursive=True))
+        else:
+            wav_files.append(path)
+    return wav_files
+
+def load_wav(path, sample_rate):
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        duration = len(audio) / rate
+        target = np.linspace(0, duration, int(duration * sample_rate), endpoint=False)
+        audio = np.interp(target, np.arange(len(audio)) / rate, audio)
+    return audio.astype(np.int16)
+
+def run_file(scorer, audio, chunk_size, sample_rate, latencies):
+    # simulated clock so the gate's tail window behaves as it would live
+    scorer.reset()
+    scorer.last_audio_level_over_threshold = 0
+    detections = 0
+    scored_frames = 0
+    for start in range(0, len(audio) - chunk_size + 1, chunk_size):
+        frame = audio[start:start + chunk_size]
+        now = start / sample_rate
+        frame_start = time.perf_counter()
+        audio_level = scorer.audio_level(frame)
+        if scorer.gate(audio_level, now):
+            scored_frames += 1
+            assistant, score = scorer.detect(frame)
+            latencies.append(time.perf_counter() - frame_start)
+            if assistant is not None:
+                detections += 1
+                # the live detector predicts silence after every wake
+                scorer.reset()
+        else:
+            latencies.append(time.perf_counter() - frame_start)
+    return detections, scored_frames
+
+def benchmark_model(name, setup, framework, chunk_size, positives, negatives, args):
+    # setup is (model_owners, thresholds, listening_for) as returned by wake_word_setup()
+    model_owners, thresholds, listening_for = setup
+    model = Model(
+        wakeword_models=list(model_owners),
+        inference_framework=framework,
+        vad_threshold=args.vad_threshold / args.max_threshold,
+    )
+    scorer = WakeWordScorer(model, args.vad_threshold, score_threshold=args.threshold, sample_rate=args.sample_rate,
+                            model_owners=model_owners, thresholds=thresholds)
+    scorer.listening_for = listening_for
+    latencies = []
+    result = {
+        "model": name,
+        "chunk_size": chunk_size,
+        "frames": 0,
+        "scored_frames": 0,
+        "audio_seconds": 0.0,
+        "detections": 0,
+        "missed_files": [],
+        "false_triggers": 0,
+        "false_trigger_files": [],
+    }
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    files = [(path, audio, False) for path, audio in positives] + [(path, audio, True) for path, audio in negatives]
+    for path, audio, is_negative in files:
+        detections, scored_frames = run_file(scorer, audio, chunk_size, args.sample_rate, latencies)
+        result["frames"] += len(audio) // chunk_size
+        result["scored_frames"] += scored_frames
+        result["audio_seconds"] += len(audio) / args.sample_rate
+        if is_negative:
+            result["false_triggers"] += detections
+            if detections:
+                result["false_trigger_files"].append(path)
+        else:
+            result["detections"] += detections
+            if not detections:
+                result["missed_files"].append(path)
+    wall_time = time.perf_counter() - wall_start
+    result["cpu_seconds"] = round(time.process_time() - cpu_start, 3)
+    result["real_time_factor"] = round(wall_time / result["audio_seconds"], 4) if result["audio_seconds"] else None
+    if latencies:
+        latencies_ms = np.array(latencies) * 1000
+        for pct in (50, 90, 99):
+            result[f"latency_p{pct}_ms"] = round(float(np.percentile(latencies_ms, pct)), 3)
+        result["latency_max_ms"] = round(float(latencies_ms.max()), 3)
+    return result
+
+def print_result(result):
+    print(f"{result['model']} (chunk {result['chunk_size']})")
+    print(f"  audio: {result['audio_seconds']:.1f}s, frames: {result['frames']}, scored: {result['scored_frames']}")
+    if "latency_p50_ms" in result:
+        print(f"  latency ms: p50 {result['latency_p50_ms']}, p90 {result['latency_p90_ms']}, "
+              f"p99 {result['latency_p99_ms']}, max {result['latency_max_ms']}")
+    print(f"  cpu: {result['cpu_seconds']}s, real-time factor: {result['real_time_factor']}")
+    print(f"  detections: {result['detections']}, missed files: {len(result['missed_files'])}, "
+          f"false triggers: {result['false_triggers']}")
+
+def main():
+    config = json.load(open(config_file)) if os.path.exists(config_file) else {}
+    parser = argparse.ArgumentParser(description="Offline wake word replay benchmark.")
+    parser.add_argument("positive", nargs="*", help="WAV files or directories that contain the wake word")
+    parser.add_argument("--negative", nargs="*", default=[], help="WAV files or directories without the wake word; detections count as false triggers")
+    parser.add_argument("--models", nargs="*", help="test these model files one at a time (every model in oww_models/ if none are listed) "
+                                                    "instead of what the detector loads for config.json")
+    parser.add_argument("--framework", choices=["tflite", "onnx"], help="test each model for this inference framework one at a time")
+    parser.add_argument("--chunk-sizes", nargs="*", type=int, default=[config.get("oww_chunk_size", 1280)])
+    parser.add_argument("--sample-rate", type=int, default=config.get("oww_sample_rate", 16000))
+    parser.add_argument("--vad-threshold", type=int, default=config.get("vad_threshold", 1000))
+    parser.add_argument("--max-threshold", type=int, default=config.get("max_threshold", 5000))
+    parser.add_argument("--threshold", type=float, default=0.5, help="wake word score threshold for --models (the detector's setup uses each assistant's wake_word_threshold)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    setups = []
+    if args.models is not None or args.framework:
+        models = args.models or sorted(glob.glob(os.path.join(models_dir, "*.tflite")) + glob.glob(os.path.join(models_dir, "*.onnx")))
+        if args.framework:
+            models = [model for model in models if model.endswith("." + args.framework)]
+        for model_path in models:
+            name = os.path.basename(model_path)
+            setups.append((name, ({model_path: name}, {name: args.threshold}, None), model_path.split(".")[-1]))
+    else:
+        if "assistant" not in config or "oww_model" not in config:
+            parser.error("config.json has no assistant/oww_model; pass --models to test model files")
+        with open(assistants_file) as f:
+            assistants = json.load(f)
+        setup = wake_word_setup(config, assistants, models_dir)
+        listening = "all assistants" if setup[2] is None else ", ".join(sorted(setup[2]))
+        setups.append((f"{config['oww_model']} (listening for {listening})", setup, config["oww_model"].split(".")[-1]))
+    positives = [(path, load_wav(path, args.sample_rate)) for path in find_wav_files(args.positive)]
+    negatives = [(path, load_wav(path, args.sample_rate)) for path in find_wav_files(args.negative)]
+    if not positives and not negatives:
+        parser.error("no WAV files given")
+
+    results = []
+    for name, setup, framework in setups:
+        for chunk_size in args.chunk_sizes:
+            try:
+                result = benchmark_model(name, setup, framework, chunk_size, positives, negatives, args)
+            except Exception as e:
+                print(f"Failed to benchmark {name}: {e}")
+                continue
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# wakeword_worker.py
+# Runs openWakeWord inference in its own process so Model.predict doesn't share the GIL
+# with Flask/SocketIO, the LLM stream, TTS or the LED threads.
+#
+# The parent writes mic audio into a SharedAudioRingBuffer and talks to the worker over
+# stdin (commands) and stdout (one JSON event per line). The worker is started as a
+# plain script rather than with multiprocessing so it never re-imports main.py.
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from audio_ring_buffer import SharedAudioRingBuffer
+
+worker_script_path = os.path.abspath(__file__)
+
+class WakeWordWorker:
+    def __init__(self, wakeword_models, inference_framework, vad_threshold, max_threshold,
+                 frame_size, sample_rate, num_frames=64, score_threshold=0.5, model_owners=None, thresholds=None):
+        self.ring = SharedAudioRingBuffer(frame_size, num_frames)
+        self.events = queue.Queue()
+        self.command_lock = threading.Lock()
+        command = [
+            sys.executable, worker_script_path,
+            "--shm-name", self.ring.name,
+            "--frame-size", str(frame_size),
+            "--num-frames", str(num_frames),
+            "--sample-rate", str(sample_rate),
+            "--framework", inference_framework,
+            "--vad-threshold", str(vad_threshold),
+            "--max-threshold", str(max_threshold),
+            "--score-threshold", str(score_threshold),
+            "--model-owners", json.dumps(model_owners or {}),
+            "--thresholds", json.dumps(thresholds or {}),
+            "--models", *wakeword_models,
+        ]
+        print("Starting wake word worker process...")
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self.reader_thread = threading.Thread(target=self._read_events, daemon=True)
+        self.reader_thread.start()
+
+    def _read_events(self):
+        for line in self.process.stdout:
+            try:
+                self.events.put(json.loads(line))
+            except ValueError:
+                print(f"Wake word worker: {line.rstrip()}")
+        self.events.put({"event": "exit"})
+
+    def _send(self, command):
+        with self.command_lock:
+            try:
+                self.process.stdin.write(command + "\n")
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError):
+                pass
+
+    def write(self, in_data):
+        self.ring.write(in_data)
+
+    def next_event(self, timeout=None):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def pause(self):
+        self._send("pause")
+
+    def resume(self):
+        # drop events for audio the worker scored before it was paused
+        while not self.events.empty():
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event.get("event") == "exit":
+                self.events.put(event)
+                break
+        self._send("resume")
+
+    def reset(self):
+        self._send("reset")
+
+    def set_vad_threshold(self, vad_threshold):
+        self._send(f"vad_threshold {vad_threshold}")
+
+    def set_listening_for(self, assistants):
+        # None listens for every loaded assistant
+        self._send("listen_for " + json.dumps(sorted(assistants) if assistants is not None else None))
+
+    def stop(self):
+        print("Stopping wake word worker process...")
+        self._send("stop")
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.ring.close()
+
+def worker_main():
+    import argparse
+    parser = argparse.ArgumentParser(description="openWakeWord inference worker.")
+    parser.add_argument("--shm-name", required=True)
+    parser.add_argument("--frame-size", type=int, required=True)
+    parser.add_argument("--num-frames", type=int, required=True)
+    parser.add_argument("--sample-rate", type=int, required=True)
+    parser.add_argument("--framework", required=True)
+    parser.add_argument("--vad-threshold", type=float, required=True)
+    parser.add_argument("--max-threshold", type=float, required=True)
+    parser.add_argument("--score-threshold", type=float, default=0.5)
+    parser.add_argument("--model-owners", default="{}", help="JSON object of model to assistant")
+    parser.add_argument("--thresholds", default="{}", help="JSON object of assistant to score threshold")
+    parser.add_argument("--models", nargs="+", required=True)
+    args = parser.parse_args()
+
+    # keep stdout for events only; anything the libraries print goes to stderr
+    events_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    sys.stdout = sys.stderr
+
+    def send_event(event):
+        events_out.write(json.dumps(event) + "\n")
+
+    from openwakeword.model import Model
+    from wake_word_scorer import WakeWordScorer
+    model = Model(
+        wakeword_models=args.models,
+        inference_framework=args.framework,
+        vad_threshold=args.vad_threshold / args.max_threshold,
+    )
+    scorer = WakeWordScorer(model, args.vad_threshold, score_threshold=args.score_threshold, sample_rate=args.sample_rate,
+                            model_owners=json.loads(args.model_owners), thresholds=json.loads(args.thresholds))
+    ring = SharedAudioRingBuffer(args.frame_size, args.num_frames, name=args.shm_name)
+    state = {"running": True, "paused": False, "reset": False, "resume": False}
+    state_lock = threading.Lock()
+
+    def read_commands():
+        for line in sys.stdin:
+            command = line.split()
+            if not command:
+                continue
+            with state_lock:
+                if command[0] == "pause":
+                    state["paused"] = True
+                elif command[0] == "resume":
+                    state["resume"] = True
+                elif command[0] == "reset":
+                    state["reset"] = True
+                elif command[0] == "vad_threshold":
+                    scorer.vad_threshold = float(command[1])
+                elif command[0] == "listen_for":
+                    assistants = json.loads(line.split(None, 1)[1])
+                    scorer.listening_for = set(assistants) if assistants is not None else None
+                elif command[0] == "stop":
+                    break
+        with state_lock:
+            state["running"] = False
+
+    threading.Thread(target=read_commands, daemon=True).start()
+    send_event({"event": "ready"})
+    last_overruns = 0
+    while state["running"]:
+        with state_lock:
+            if state["reset"]:
+                state["reset"] = False
+                scorer.reset()
+            if state["resume"]:
+                state["resume"] = False
+                state["paused"] = False
+                ring.clear()
+            paused = state["paused"]
+        frame = ring.read_frame(timeout=0.5)
+        if frame is None or paused:
+            continue
+        if ring.overruns != last_overruns:
+            last_overruns = ring.overruns
+            send_event({"event": "overrun", "dropped_samples": ring.dropped_samples})
+        now = time.time()
+        audio_level = float(scorer.audio_level(frame))
+        gated = scorer.gate(audio_level, now)
+        send_event({"event": "level", "audio_level": audio_level, "gated": gated})
+        if not gated:
+            continue
+        assistant, score = scorer.detect(frame)
+        if assistant is not None:
+            # stay paused until the parent has handled the wake word and resumes us
+            with state_lock:
+                state["paused"] = True
+            send_event({"event": "detection", "assistant": assistant, "score": score, "time": now})
+    ring.close()
+
+if __name__ == "__main__":
+    worker_main()